@@ -0,0 +1,129 @@
+import copy
+import json
+import math
+import re
+
+from config import EMPTY_DICT_ANSWER
+
+CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+MAX_SCORE = 10
+MAX_COMMENT_LENGTH = 1024
+
+
+def load_json_answer(answer: str) -> dict | None:
+    """
+    Извлекает JSON-объект из ответа GPT: снимает обрамление ```json и берёт текст от первой
+    открывающей до последней закрывающей фигурной скобки.
+
+    :param answer: Ответ GPT.
+    :return: Словарь из ответа или None, если JSON в ответе нет.
+    """
+    answer = CODE_FENCE_PATTERN.sub("", answer.strip())
+    start, end = answer.find("{"), answer.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        result = json.loads(answer[start:end + 1])
+    except ValueError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def to_score(value: object) -> float | None:
+    """
+    Приводит оценку из ответа GPT к числу.
+
+    :param value: Оценка (число или строка с числом).
+    :return: Оценка или None, если это не конечное число (в том числе NaN и бесконечность).
+    """
+    try:
+        score = float(str(value).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    return score if math.isfinite(score) else None
+
+
+def merge_partial_answers(answers: list[str]) -> str | None:
+    """
+    Объединяет ответы GPT по частям длинного звонка в один ответ с полями EMPTY_DICT_ANSWER.
+
+    Оценка критерия - максимальная по частям (критерий выполнен, если выполнен хотя бы в одной части)
+    вместе с комментарием той же части, общая оценка - среднее по частям, общие комментарии и списки
+    объединяются без повторов.
+
+    :param answers: Ответы GPT по частям звонка в порядке частей.
+    :return: Объединённый ответ в формате JSON или None, если ни один ответ не удалось разобрать.
+    """
+    partials = [partial for partial in map(load_json_answer, answers) if partial is not None]
+    if not partials:
+        return None
+    merged: dict = {}
+    for block in EMPTY_DICT_ANSWER.values():
+        for key, default in block.items():
+            values = [partial[key] for partial in partials if partial.get(key) is not None]
+            if isinstance(default, dict):
+                scored = [
+                    (to_score(value.get("score")), value.get("comment"))
+                    for value in values if isinstance(value, dict) and to_score(value.get("score")) is not None
+                ]
+                score, comment = max(scored, key=lambda item: item[0], default=(None, None))
+                merged[key] = {"comment": comment, "score": score}
+            elif isinstance(default, list):
+                items = [item for value in values if isinstance(value, list) for item in value]
+                merged[key] = list(dict.fromkeys(map(str, items)))
+            elif key.endswith("score"):
+                scores = [score for score in map(to_score, values) if score is not None]
+                merged[key] = round(sum(scores) / len(scores), 1) if scores else None
+            else:
+                merged[key] = " ".join(dict.fromkeys(map(str, values))) or None
+    return json.dumps(merged, ensure_ascii=False)
+
+
+def to_text(value: object, max_length: int | None = None) -> str | None:
+    """
+    Приводит текстовое поле ответа GPT к строке.
+
+    :param value: Значение поля.
+    :param max_length: Максимальная длина строки (по размеру колонки БД).
+    :return: Строка без пробелов по краям или None, если поле пустое.
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text[:max_length] if text else None
+
+
+def parse_answer(answer: str) -> dict | None:
+    """
+    Разбирает ответ GPT в структуру EMPTY_DICT_ANSWER.
+
+    Оценки приводятся к числам в диапазоне от 0 до MAX_SCORE (оценки критериев - к целым),
+    комментарии критериев обрезаются до размера колонки, списки приводятся к спискам строк.
+    Поля, которых нет в ответе, остаются None (списки - пустыми).
+
+    :param answer: Ответ GPT.
+    :return: Заполненная копия EMPTY_DICT_ANSWER или None, если в ответе нет JSON-объекта.
+    """
+    parsed = load_json_answer(answer)
+    if parsed is None:
+        return None
+    result = copy.deepcopy(EMPTY_DICT_ANSWER)
+    for block in result.values():
+        for key, default in block.items():
+            value = parsed.get(key)
+            if isinstance(default, dict):
+                value = value if isinstance(value, dict) else {}
+                score = to_score(value.get("score"))
+                block[key] = {
+                    "comment": to_text(value.get("comment"), MAX_COMMENT_LENGTH),
+                    "score": round(min(max(score, 0), MAX_SCORE)) if score is not None else None,
+                }
+            elif isinstance(default, list):
+                items = value if isinstance(value, list) else [value]
+                block[key] = [text for text in map(to_text, items) if text]
+            elif key.endswith("score"):
+                score = to_score(value)
+                block[key] = round(min(max(score, 0), MAX_SCORE), 1) if score is not None else None
+            else:
+                block[key] = to_text(value)
+    return result
@@ -0,0 +1,64 @@
+import hashlib
+
+from analysis_handler.prompts import PROMPT_VERSION
+from db.db_cache_data import CacheData
+from loggers import logger
+
+
+class AnalysisCache:
+    """
+    Кэш ответов GPT.
+
+    Ключ кэша - sha256 от текста транскрибации, версии шаблона запроса и имени модели, поэтому повторный
+    анализ того же звонка (падение между ответом GPT и записью в БД, повторная постановка в очередь)
+    не оплачивается второй раз. Доля попаданий пишется в лог.
+    """
+
+    def __init__(self, cache_db: CacheData, model_name: str) -> None:
+        self.cache_db = cache_db
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Доля попаданий в кэш среди всех обращений."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_key(self, transcription: str) -> str:
+        """
+        Формирует ключ кэша для текста транскрибации.
+
+        :param transcription: Текст транскрибации звонка.
+        :return: Ключ кэша.
+        """
+        key_source = f"{PROMPT_VERSION}\n{self.model_name}\n{transcription}"
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    async def get(self, cache_key: str) -> str | None:
+        """
+        Возвращает ответ GPT из кэша.
+
+        :param cache_key: Ключ кэша.
+        :return: Ответ GPT или None при промахе.
+        """
+        answer = await self.cache_db.get_analysis(cache_key)
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        logger.info(
+            f"[+] Кэш анализа: {'попадание' if answer is not None else 'промах'} {cache_key[:12]} "
+            f"(попаданий: {self.hits}, промахов: {self.misses}, доля попаданий: {self.hit_rate:.0%})"
+        )
+        return answer
+
+    async def set(self, cache_key: str, answer: str) -> None:
+        """
+        Сохраняет ответ GPT в кэш.
+
+        :param cache_key: Ключ кэша.
+        :param answer: Ответ GPT.
+        """
+        await self.cache_db.set_analysis(cache_key, self.model_name, PROMPT_VERSION, answer)
@@ -0,0 +1,141 @@
+import re
+from functools import lru_cache
+
+import tiktoken
+
+from config import CHANNEL_SPEAKERS
+
+FILLER_PATTERN = re.compile(
+    r"[,\s]*(?<![\w-])(?:э+|эм+|мм+|хм+)(?![\w-])[,.…]*",
+    re.IGNORECASE,
+)
+SPACES_PATTERN = re.compile(r"\s+")
+SPACE_BEFORE_PUNCTUATION_PATTERN = re.compile(r"\s+([,.!?…])")
+LEADING_PUNCTUATION_PATTERN = re.compile(r"^[\s,.…]+")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?…])\s+")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str) -> tiktoken.Encoding:
+    """
+    Возвращает токенизатор модели GPT (по умолчанию - cl100k_base).
+
+    :param model_name: Имя модели GPT.
+    :return: Токенизатор tiktoken.
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """
+    Считает количество токенов текста локально, без запроса к API.
+
+    :param text: Текст.
+    :param model_name: Имя модели GPT.
+    :return: Количество токенов.
+    """
+    return len(get_encoding(model_name).encode(text))
+
+
+def remove_fillers(text: str) -> str:
+    """
+    Удаляет из реплики междометия-заполнители пауз (э, эм, мм, хм), не несущие смысла для анализа.
+    Слова, которые бывают и паразитами, и значимыми (ну, типа, это самое), не трогаются.
+
+    :param text: Текст реплики.
+    :return: Очищенный текст.
+    """
+    text = FILLER_PATTERN.sub(" ", text)
+    text = SPACE_BEFORE_PUNCTUATION_PATTERN.sub(r"\1", SPACES_PATTERN.sub(" ", text))
+    return LEADING_PUNCTUATION_PATTERN.sub("", text).strip()
+
+
+def compact_transcript(segments: list[dict]) -> str:
+    """
+    Собирает компактный текст разговора из сегментов транскрибации.
+
+    Из реплик удаляются междометия-заполнители пауз, повторы одной и той же реплики одного говорящего подряд
+    (типичные зацикливания Whisper на тишине и музыке) схлопываются, а идущие подряд реплики одного
+    говорящего объединяются в одну строку.
+
+    :param segments: Сегменты транскрибации (поле SEGMENTS), в стерео-записях с полем speaker.
+    :return: Текст разговора, по строке на реплику.
+    """
+    lines: list[list] = []
+    previous_line = None
+    for segment in segments:
+        text = remove_fillers(segment.get("text", ""))
+        speaker = segment.get("speaker")
+        if not text or (speaker, text.lower()) == previous_line:
+            continue
+        previous_line = (speaker, text.lower())
+        if lines and lines[-1][0] == speaker:
+            lines[-1][1].append(text)
+        else:
+            lines.append([speaker, [text]])
+    return "\n".join(f"{speaker}: {' '.join(texts)}" if speaker else " ".join(texts) for speaker, texts in lines)
+
+
+def split_line(line: str, max_tokens: int, model_name: str) -> list[str]:
+    """
+    Делит строку разговора длиннее max_tokens токенов на части по границам предложений,
+    а предложения длиннее max_tokens - по словам. Метка говорящего повторяется в начале каждой части.
+
+    :param line: Строка разговора (реплика).
+    :param max_tokens: Максимальное количество токенов в части.
+    :param model_name: Имя модели GPT.
+    :return: Части строки.
+    """
+    speaker, separator, text = line.partition(": ")
+    if not separator or speaker not in CHANNEL_SPEAKERS.values():
+        speaker, text = "", line
+    prefix = f"{speaker}: " if speaker else ""
+    budget = max(max_tokens - count_tokens(prefix, model_name), 1)
+    pieces: list[str] = []
+    piece_units: list[str] = []
+    piece_tokens = 0
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        sentence_tokens = count_tokens(sentence, model_name) + 1
+        units = [sentence] if sentence_tokens <= budget else sentence.split()
+        for unit in units:
+            unit_tokens = sentence_tokens if len(units) == 1 else count_tokens(unit, model_name) + 1
+            if piece_units and piece_tokens + unit_tokens > budget:
+                pieces.append(" ".join(piece_units))
+                piece_units, piece_tokens = [], 0
+            piece_units.append(unit)
+            piece_tokens += unit_tokens
+    if piece_units:
+        pieces.append(" ".join(piece_units))
+    return [prefix + piece for piece in pieces]
+
+
+def split_transcript(transcript: str, max_tokens: int, model_name: str) -> list[str]:
+    """
+    Делит текст разговора на части не длиннее max_tokens токенов по границам реплик.
+    Реплика длиннее max_tokens (в моно-записях это весь разговор) делится split_line
+    по границам предложений.
+
+    :param transcript: Текст разговора, по строке на реплику.
+    :param max_tokens: Максимальное количество токенов в части.
+    :param model_name: Имя модели GPT.
+    :return: Части текста разговора.
+    """
+    chunks: list[str] = []
+    chunk_lines: list[str] = []
+    chunk_tokens = 0
+    for line in transcript.splitlines():
+        line_tokens = count_tokens(line, model_name) + 1
+        pieces = split_line(line, max_tokens, model_name) if line_tokens > max_tokens else [line]
+        for piece in pieces:
+            piece_tokens = line_tokens if len(pieces) == 1 else count_tokens(piece, model_name) + 1
+            if chunk_lines and chunk_tokens + piece_tokens > max_tokens:
+                chunks.append("\n".join(chunk_lines))
+                chunk_lines, chunk_tokens = [], 0
+            chunk_lines.append(piece)
+            chunk_tokens += piece_tokens
+    if chunk_lines:
+        chunks.append("\n".join(chunk_lines))
+    return chunks
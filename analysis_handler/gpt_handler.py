@@ -1,65 +1,148 @@
 import asyncio
 import os
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-import requests
+import aiohttp
 from dotenv import load_dotenv
 
+from analysis_handler.compaction import count_tokens
+from analysis_handler.proxy_manager import ProxyManager
+from analysis_handler.rate_limiter import RateLimiter
+from loggers import logger
+
 
 class GPTHandler:
-    """Класс для работы с ChatGPT."""
+    """
+    Асинхронный клиент ChatGPT.
+
+    Держит одну сессию aiohttp с пулом keep-alive соединений, ограничивает число одновременных запросов
+    семафором, а поток запросов - лимитами провайдера на запросы и токены в минуту. На ответ 429
+    выдерживает паузу из заголовка Retry-After и повторяет запрос.
+    Запросы идут через рабочий прокси из ProxyManager, при сетевой ошибке повтор уходит через другой прокси.
+    """
+
+    url = "https://api.openai.com/v1/chat/completions"
+    response_tokens_reserve = 1000
 
-    def __init__(self):
+    def __init__(self, proxy_manager: ProxyManager | None = None) -> None:
         load_dotenv()
-        proxy_url = os.getenv('PROXY_URL')
-        self.__api_key = os.getenv('GPT_API')
-        self.__proxies = {'https': proxy_url}
-        self.proxy_ip = os.getenv('PROXY_IP')
-        self.status_proxy = False
-
-    async def check_proxy(self) -> None:
-        """"Метод проверки proxy."""
-
-        self.status_proxy = False
-        response_ip = requests.get('https://api.ipify.org?format=json', proxies=self.__proxies)
-        if response_ip.status_code == 200:
-            my_ip = response_ip.json()['ip']
-            if my_ip == self.proxy_ip:
-                self.status_proxy = True
+        self.__api_key = os.getenv("GPT_API")
+        self.proxy_manager = proxy_manager or ProxyManager()
+        self.model = os.getenv("GPT_MODEL", "gpt-3.5-turbo")
+        self.concurrency = int(os.getenv("GPT_CONCURRENCY", 4))
+        self.max_retries = int(os.getenv("GPT_MAX_RETRIES", 5))
+        self.timeout = aiohttp.ClientTimeout(total=float(os.getenv("GPT_TIMEOUT", 120)))
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=float(os.getenv("GPT_RPM", 500)),
+            tokens_per_minute=float(os.getenv("GPT_TPM", 60000)),
+        )
+        self.session: aiohttp.ClientSession | None = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает сессию клиента, создавая её при первом обращении.
+
+        :return: Сессия aiohttp.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def start(self) -> None:
+        """Проверяет прокси и запускает их фоновую проверку."""
+
+        await self.proxy_manager.start()
+
+    async def close(self) -> None:
+        """Закрывает сессию, все открытые соединения и останавливает проверку прокси."""
+
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        await self.proxy_manager.close()
 
     async def get_gpt_balance(self):
         pass
 
-    async def get_gpt_response(self, promt: str) -> str:
+    def estimate_tokens(self, promt: str) -> int:
+        """
+        Оценивает количество токенов запроса вместе с резервом на ответ.
+
+        :param promt: Запрос в текстовом формате.
+        :return: Оценка количества токенов.
+        """
+        return count_tokens(promt, self.model) + self.response_tokens_reserve
+
+    @staticmethod
+    def get_retry_after(response: aiohttp.ClientResponse) -> float | None:
+        """
+        Возвращает паузу перед повтором из заголовков ответа (retry-after-ms или Retry-After).
+
+        :param response: Ответ API.
+        :return: Пауза в секундах или None, если заголовка нет.
+        """
+        if retry_after_ms := response.headers.get("retry-after-ms"):
+            return float(retry_after_ms) / 1000
+        retry_after = response.headers.get("Retry-After")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            return max((parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    async def get_gpt_response(self, promt: str) -> str | None:
         """
         Метод делает запрос к GPT и возвращает ответ.
 
         :param promt: Запрос в текстовом формате.
-        :return: Ответ бота.
+        :return: Ответ бота или None, если ответ получить не удалось.
         """
-        answer = 'Произошла ошибка, повторите пожалуйста ваш вопрос'
-        await self.check_proxy()
-        if not self.status_proxy:
-            raise UserWarning('Ошибка прокси')
+        answer = None
         headers = {
-            'Authorization': f'Bearer {self.__api_key}',
+            "Authorization": f"Bearer {self.__api_key}",
             "Content-Type": "application/json"
         }
-        url = 'https://api.openai.com/v1/chat/completions'
         data = {
-            'model': 'gpt-3.5-turbo',
-            'messages': [
-                {'role': 'user', 'content': promt},
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": promt},
             ],
-            # 'max_tokens': 50,
-            'temperature': 0.5,
-            'top_p': 0.5,
+            # "max_tokens": 50,
+            "temperature": 0.5,
+            "top_p": 0.5,
         }
-        response = requests.post(url, proxies=self.__proxies, headers=headers, json=data)
-        json_answer = response.json()
-        answer = json_answer['choices'][0]['message']['content']
+        estimated_tokens = self.estimate_tokens(promt)
+        for attempt in range(1, self.max_retries + 1):
+            retry_delay = min(2 ** attempt, 60)
+            proxy = await self.proxy_manager.get_proxy()
+            try:
+                await self.rate_limiter.acquire(estimated_tokens)
+                async with self.semaphore:
+                    async with self.get_session().post(self.url, headers=headers, json=data, proxy=proxy) as response:
+                        self.proxy_manager.report_success(proxy)
+                        if response.status == 200:
+                            json_answer = await response.json()
+                            used_tokens = json_answer.get("usage", {}).get("total_tokens", estimated_tokens)
+                            self.rate_limiter.tokens.adjust(used_tokens - estimated_tokens)
+                            answer = json_answer["choices"][0]["message"]["content"]
+                            break
+                        if response.status == 429:
+                            retry_delay = self.get_retry_after(response) or retry_delay
+                            self.rate_limiter.pause(retry_delay)
+                        elif response.status < 500:
+                            logger.error(f"Ошибка запроса к GPT. Код состояния: {response.status}")
+                            break
+                        logger.warning(
+                            f"GPT ответил {response.status}, попытка {attempt} из {self.max_retries}, "
+                            f"повтор через {retry_delay:.1f} сек."
+                        )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                self.proxy_manager.report_failure(proxy)
+                logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+            if attempt < self.max_retries:
+                await asyncio.sleep(retry_delay)
         return answer
-
-test = GPTHandler()
-print(test.status_proxy)
-asyncio.run(test.get_gpt_response('Hello. How are you ?'))
-print(test.status_proxy)
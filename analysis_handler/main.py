@@ -1,53 +1,129 @@
 import asyncio
-from random import randint
 
+from analysis_handler.answer_parser import merge_partial_answers, parse_answer
+from analysis_handler.cache import AnalysisCache
+from analysis_handler.compaction import compact_transcript, count_tokens, split_transcript
 from analysis_handler.gpt_handler import GPTHandler
+from analysis_handler.prompts import build_prompt
+from config import (
+    ANALYSIS_CHUNK_TOKENS,
+    ANALYSIS_LEASE_SECONDS,
+    ANALYSIS_MAX_TRANSCRIPT_TOKENS,
+    FALLBACK_POLL_SECONDS,
+)
 from db.db_analysis_data import AnalysisData
+from db.db_cache_data import CacheData
 from db.db_call_data import CallData
+from db.db_connector import BaseConnector
+from db.db_notify import CALL_TRANSCRIBED_CHANNEL, NotificationListener
 from loggers import logger
 
 
+async def get_gpt_analysis(transcription: str, gpt_handler: GPTHandler) -> str | None:
+    """
+    Анализирует текст разговора в GPT. Если текст длиннее ANALYSIS_MAX_TRANSCRIPT_TOKENS,
+    он делится на части по репликам (длинные реплики - по предложениям), части анализируются параллельно (map),
+    а их оценки объединяются в один ответ (reduce).
+
+    :param transcription: Компактный текст разговора.
+    :param gpt_handler: Экземпляр GPTHandler.
+    :return: Ответ GPT или None, если анализ не удался.
+    """
+    if count_tokens(transcription, gpt_handler.model) <= ANALYSIS_MAX_TRANSCRIPT_TOKENS:
+        return await gpt_handler.get_gpt_response(promt=build_prompt(transcription))
+    chunks = split_transcript(transcription, ANALYSIS_CHUNK_TOKENS, gpt_handler.model)
+    logger.info(f"[+] Длинный звонок анализируется по частям: {len(chunks)}")
+    answers = await asyncio.gather(
+        *(
+            gpt_handler.get_gpt_response(promt=build_prompt(chunk, part, len(chunks)))
+            for part, chunk in enumerate(chunks, start=1)
+        )
+    )
+    if any(answer is None for answer in answers):
+        return None
+    return merge_partial_answers(list(answers))
+
+
+async def analyze_call(
+        call_id: str,
+        analysis_db: AnalysisData,
+        gpt_handler: GPTHandler,
+        cache: AnalysisCache,
+) -> None:
+    """
+    Анализирует один звонок: собирает из сегментов транскрибации компактный текст разговора
+    (без междометий-заполнителей и повторов) и отправляет его в GPT.
+    Число одновременных запросов и их темп ограничивает сам GPTHandler.
+    Если этот текст уже анализировался той же моделью и той же версией запроса, ответ берётся из кэша.
+    Ответ разбирается в структуру EMPTY_DICT_ANSWER и записывается в БД одной транзакцией вместе
+    со статусом анализа. Если ответ не удалось разобрать, в БД записывается ошибка.
+
+    :param call_id: id звонка.
+    :param analysis_db: Экземпляр AnalysisData.
+    :param gpt_handler: Экземпляр GPTHandler.
+    :param cache: Кэш ответов GPT.
+    """
+    try:
+        segments = await analysis_db.get_transcription_segments(call_id)
+        transcription = compact_transcript(segments) if segments else await analysis_db.get_transcription_text(call_id)
+        if not transcription:
+            logger.warning(f"[+] Звонок {call_id} помечен, но транскрибации нет")
+            return
+        logger.info(f"[+] Начинаем анализ звонка {call_id}")
+        cache_key = cache.get_key(transcription)
+        gpt_answer = await cache.get(cache_key)
+        is_cached = gpt_answer is not None
+        if not is_cached:
+            gpt_answer = await get_gpt_analysis(transcription, gpt_handler)
+            if gpt_answer is None:
+                logger.info(f"[+] Ошибка при анализе звонка {call_id}, звонок будет захвачен повторно")
+                return
+        analysis_result = parse_answer(gpt_answer)
+        if analysis_result is None:
+            logger.warning(f"[+] Не удалось разобрать ответ GPT по звонку {call_id}")
+            await analysis_db.save_analysis_error(call_id, "Не удалось разобрать ответ GPT")
+            return
+        if not is_cached:
+            await cache.set(cache_key, gpt_answer)
+        if await analysis_db.save_analysis(call_id, analysis_result):
+            logger.info(f"[+] Анализ звонка {call_id} успешно завершен")
+    except Exception as ex:
+        logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+
+
 async def main():
-    print("START")
     logger.info("[+] Start analysis handler")
     analysis_db = AnalysisData()
     gpt_handler = GPTHandler()
+    await gpt_handler.start()
+    cache = AnalysisCache(CacheData(), gpt_handler.model)
     call_db = CallData()
     await call_db.create_tables()
+    worker_id = call_db.get_worker_id()
+    listener = NotificationListener(CALL_TRANSCRIBED_CHANNEL)
+    await listener.start()
 
-    while True:
-        try:
-            list_id_calls_for_analysis = await call_db.get_calls_for_analysis()
-            if not list_id_calls_for_analysis:
-                logger.info("[PAUSE] list_id_calls_for_analysis is empty, analysis_handler sleep 5min")
-                await asyncio.sleep(300)
-                continue
-            for call_id in list_id_calls_for_analysis:
-                transcription = await analysis_db.get_transcription_text(call_id)
-                if transcription:
-                    logger.info(f"[+] Начинаем анализ звонка {call_id}")
-
-                    while True:
-                        gpt_answer = await gpt_handler.get_gpt_response(promt=transcription)
-                        if gpt_answer is not None:
-                            logger.info(f"[+] Анализ звонка {call_id} успешно завершен")
-                            await asyncio.sleep(randint(5, 15))
-                            break
-                        logger.info(f"[+] Ошибка при анализе звонка {call_id}, запускаем повторно")
-                        await asyncio.sleep(randint(15, 25))
-                    # if result_gpt_analysis["result"]:
-                    #     analysis_result = result_gpt_analysis["result"]
-                    #     if await analysis_db.update_general_analysis_data(call_id, analysis_result):
-                    #         if await analysis_db.insert_evaluations_analysis(call_id, analysis_result):
-                    #             if await analysis_db.insert_commentary_analysis(call_id, analysis_result):
-                    #                 await call_db.update_status(call_id, "ANALYSIS_STATUS", "[OK_TEST]")
-                    # elif result_gpt_analysis["error"]:
-                    #     if await analysis_db.update_error_data(call_id, result_gpt_analysis["error"]):
-                    #         await call_db.update_status(call_id, "ANALYSIS_STATUS", "[ERROR_TEST]")
-                else:
-                    logger.warning(f"[+] Звонок {call_id} помечен, но транскрибации нет")
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}")
+    try:
+        while True:
+            try:
+                claimed_calls = await call_db.claim_calls(
+                    "ANALYSIS", worker_id, count=gpt_handler.concurrency * 2, lease_seconds=ANALYSIS_LEASE_SECONDS
+                )
+                list_id_calls_for_analysis = [call["call_id"] for call in claimed_calls]
+                if not list_id_calls_for_analysis:
+                    logger.info("[PAUSE] list_id_calls_for_analysis is empty, analysis_handler waits")
+                    await listener.wait(FALLBACK_POLL_SECONDS)
+                    continue
+                await asyncio.gather(
+                    *(analyze_call(call_id, analysis_db, gpt_handler, cache) for call_id in list_id_calls_for_analysis)
+                )
+            except Exception as ex:
+                logger.debug(f"{ex.__class__.__name__}: {ex}")
+    finally:
+        await call_db.release_calls("ANALYSIS", worker_id)
+        await gpt_handler.close()
+        await listener.close()
+        await BaseConnector.close_pool()
 
 
 if __name__ == "__main__":
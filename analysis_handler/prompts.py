@@ -0,0 +1,61 @@
+"""
+Шаблон запроса к GPT для анализа звонка.
+
+PROMPT_VERSION входит в ключ кэша результатов анализа: при любом изменении шаблона или критериев
+версию нужно увеличить, иначе из кэша будут браться ответы на старый запрос.
+"""
+
+PROMPT_VERSION = 2
+
+CRITERIA = {
+    "greeting": "Приветствие: менеджер поздоровался, представился и назвал компанию",
+    "speech": "Речь: грамотность, вежливость, отсутствие слов-паразитов",
+    "initiative": "Инициатива: менеджер ведёт разговор и задаёт его направление",
+    "need": "Выявление потребности: менеджер задаёт вопросы и выясняет задачу клиента",
+    "offer": "Предложение: менеджер предлагает решение под выявленную потребность",
+    "objection": "Работа с возражениями: менеджер отрабатывает сомнения клиента",
+    "perseverance": "Настойчивость: менеджер не сдаётся после первого отказа",
+    "advantages": "Преимущества: менеджер рассказывает о преимуществах компании и продукта",
+    "agreement": "Договорённость: звонок завершается конкретной следующей договорённостью",
+}
+
+PROMPT_TEMPLATE = """Ты - руководитель отдела продаж. Оцени телефонный разговор менеджера с клиентом.
+
+Оцени каждый критерий по шкале от 0 до 10 и кратко прокомментируй оценку:
+{criteria}
+
+Ответь только JSON-объектом без пояснений в формате:
+{{
+    "general_comment": "общий комментарий к звонку",
+    "total_score": общая оценка звонка от 0 до 10,
+{criteria_format}
+    "resume_manager": ["сильные и слабые стороны менеджера"],
+    "recommendations": ["рекомендации менеджеру"]
+}}
+
+{part_note}Расшифровка разговора:
+{transcription}"""
+
+PART_NOTE_TEMPLATE = """Это часть {part} из {parts} длинного разговора. Оценивай только то, что есть в этой части:
+для критериев, которые в ней не проявились, укажи "comment": null и "score": null.
+
+"""
+
+
+def build_prompt(transcription: str, part: int = 1, parts: int = 1) -> str:
+    """
+    Формирует запрос к GPT для анализа звонка или одной части длинного звонка.
+
+    :param transcription: Текст транскрибации звонка или его части.
+    :param part: Номер части (с единицы).
+    :param parts: Количество частей звонка.
+    :return: Запрос в текстовом формате.
+    """
+    return PROMPT_TEMPLATE.format(
+        criteria="\n".join(f"- {name}: {description}" for name, description in CRITERIA.items()),
+        criteria_format="\n".join(
+            f'    "{name}": {{"comment": "комментарий", "score": оценка от 0 до 10}},' for name in CRITERIA
+        ),
+        part_note=PART_NOTE_TEMPLATE.format(part=part, parts=parts) if parts > 1 else "",
+        transcription=transcription,
+    )
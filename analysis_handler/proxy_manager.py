@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+from loggers import logger
+
+
+class ProxyState:
+    """Состояние одного прокси: результат последней проверки и число ошибок запросов подряд."""
+
+    def __init__(self, url: str, expected_ip: str | None) -> None:
+        self.url = url
+        self.expected_ip = expected_ip
+        self.healthy = False
+        self.checked_at = 0.0
+        self.failures = 0
+
+
+class ProxyManager:
+    """
+    Пул прокси для запросов к GPT с кэшированной проверкой работоспособности.
+
+    Прокси проверяются в фоне раз в health_ttl секунд (внешний IP должен совпасть с ожидаемым),
+    поэтому на пути запроса к GPT проверок нет. Запросы распределяются по рабочим прокси по кругу,
+    а прокси, на котором max_failures запросов подряд завершились ошибкой, исключается из ротации
+    до следующей успешной фоновой проверки. Если прокси не заданы, запросы идут напрямую.
+    """
+
+    check_url = "https://api.ipify.org?format=json"
+
+    def __init__(self) -> None:
+        load_dotenv()
+        proxy_urls = [url.strip() for url in os.getenv("PROXY_URLS", os.getenv("PROXY_URL", "")).split(",")]
+        proxy_ips = [ip.strip() for ip in os.getenv("PROXY_IPS", os.getenv("PROXY_IP", "")).split(",")]
+        self.proxies = [
+            ProxyState(url, proxy_ips[index] if index < len(proxy_ips) and proxy_ips[index] else None)
+            for index, url in enumerate(proxy_urls) if url
+        ]
+        self.health_ttl = float(os.getenv("PROXY_HEALTH_TTL", 300))
+        self.max_failures = int(os.getenv("PROXY_MAX_FAILURES", 3))
+        self.timeout = aiohttp.ClientTimeout(total=float(os.getenv("PROXY_CHECK_TIMEOUT", 10)))
+        self.session: aiohttp.ClientSession | None = None
+        self.health_task: asyncio.Task | None = None
+        self.check_lock = asyncio.Lock()
+        self.next_index = 0
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает сессию для проверок, создавая её при первом обращении.
+
+        :return: Сессия aiohttp.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+        return self.session
+
+    async def start(self) -> None:
+        """Проверяет все прокси и запускает фоновую проверку."""
+
+        if not self.proxies:
+            logger.info("[+] Прокси не заданы, запросы к GPT идут напрямую")
+            return
+        await self.check_all()
+        if self.health_task is None or self.health_task.done():
+            self.health_task = asyncio.create_task(self.health_loop())
+
+    async def close(self) -> None:
+        """Останавливает фоновую проверку и закрывает сессию."""
+
+        if self.health_task is not None:
+            self.health_task.cancel()
+            try:
+                await self.health_task
+            except asyncio.CancelledError:
+                pass
+            self.health_task = None
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def health_loop(self) -> None:
+        """Фоновая проверка прокси раз в health_ttl секунд."""
+
+        while True:
+            await asyncio.sleep(self.health_ttl)
+            try:
+                await self.check_all()
+            except Exception as ex:
+                logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+
+    async def check(self, proxy: ProxyState) -> None:
+        """
+        Проверяет прокси: запрос через него должен вернуть ожидаемый внешний IP.
+
+        :param proxy: Проверяемый прокси.
+        """
+        healthy = False
+        try:
+            async with self.get_session().get(self.check_url, proxy=proxy.url) as response:
+                if response.status == 200:
+                    proxy_ip = (await response.json(content_type=None))["ip"]
+                    healthy = proxy.expected_ip is None or proxy_ip == proxy.expected_ip
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}")
+        if healthy != proxy.healthy:
+            logger.info(f"[+] Прокси {proxy.url} {'доступен' if healthy else 'недоступен'}")
+        proxy.healthy = healthy
+        proxy.checked_at = time.monotonic()
+        if healthy:
+            proxy.failures = 0
+
+    async def check_all(self, max_age: float = 0) -> None:
+        """
+        Параллельно проверяет прокси. Проверки не пересекаются: одновременные вызовы выполняются по очереди,
+        и прокси, проверенные за последние max_age секунд, повторно не проверяются.
+
+        :param max_age: Возраст последней проверки в секундах, после которого прокси проверяется снова.
+        """
+        async with self.check_lock:
+            now = time.monotonic()
+            await asyncio.gather(
+                *(self.check(proxy) for proxy in self.proxies if now - proxy.checked_at >= max_age)
+            )
+
+    async def get_proxy(self) -> str | None:
+        """
+        Возвращает рабочий прокси для запроса. Если рабочих прокси нет, заново проверяет прокси,
+        которые не проверялись дольше health_ttl секунд.
+
+        :return: URL прокси или None, если прокси не заданы.
+        """
+        if not self.proxies:
+            return None
+        healthy_proxies = [proxy for proxy in self.proxies if proxy.healthy]
+        if not healthy_proxies:
+            await self.check_all(max_age=self.health_ttl)
+            healthy_proxies = [proxy for proxy in self.proxies if proxy.healthy]
+        if not healthy_proxies:
+            raise UserWarning("Ошибка прокси: нет ни одного рабочего прокси")
+        proxy = healthy_proxies[self.next_index % len(healthy_proxies)]
+        self.next_index += 1
+        return proxy.url
+
+    def report_success(self, proxy_url: str | None) -> None:
+        """
+        Сбрасывает счётчик ошибок прокси после успешного запроса.
+
+        :param proxy_url: URL прокси.
+        """
+        for proxy in self.proxies:
+            if proxy.url == proxy_url:
+                proxy.failures = 0
+
+    def report_failure(self, proxy_url: str | None) -> None:
+        """
+        Учитывает ошибку запроса через прокси и исключает прокси из ротации после max_failures ошибок подряд.
+
+        :param proxy_url: URL прокси.
+        """
+        for proxy in self.proxies:
+            if proxy.url == proxy_url:
+                proxy.failures += 1
+                if proxy.healthy and proxy.failures >= self.max_failures:
+                    proxy.healthy = False
+                    proxy.checked_at = 0.0
+                    logger.warning(f"Прокси {proxy.url} исключён из ротации после {proxy.failures} ошибок подряд")
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from loggers import logger
+
+
+class TokenBucket:
+    """
+    Ведро токенов: ёмкость capacity пополняется равномерно со скоростью capacity в минуту.
+
+    Запрос ждёт, пока в ведре не наберётся нужное количество токенов. Баланс может уйти в минус,
+    если фактический расход оказался больше оценки, - тогда следующие запросы подождут дольше.
+    """
+
+    def __init__(self, capacity_per_minute: float) -> None:
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        """Пополняет ведро за время, прошедшее с последнего обращения."""
+
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Ждёт, пока в ведре наберётся amount токенов, и списывает их.
+
+        :param amount: Количество токенов. Больше ёмкости ведра списать нельзя, поэтому оно ограничивается ёмкостью.
+        """
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self.refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= amount
+
+    def adjust(self, amount: float) -> None:
+        """
+        Корректирует баланс после запроса на разницу между фактическим расходом и оценкой.
+
+        :param amount: Дополнительно списываемые (> 0) или возвращаемые (< 0) токены.
+        """
+        self.refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Ограничивает запросы к API лимитами провайдера: запросов в минуту (RPM) и токенов в минуту (TPM).
+
+    Кроме того, хранит общую для всех запросов паузу: если провайдер ответил 429 с Retry-After,
+    новые запросы не отправляются до её окончания.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Ждёт окончания паузы и возможности отправить запрос с оценкой tokens токенов.
+
+        :param tokens: Оценка количества токенов запроса (запрос и ответ).
+        """
+        while (delay := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire()
+        await self.tokens.acquire(tokens)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостанавливает отправку новых запросов на seconds секунд.
+
+        :param seconds: Длительность паузы.
+        """
+        paused_until = time.monotonic() + seconds
+        if paused_until > self.paused_until:
+            self.paused_until = paused_until
+            logger.warning(f"Превышен лимит запросов API, отправка приостановлена на {seconds:.1f} сек.")
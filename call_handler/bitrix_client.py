@@ -0,0 +1,159 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiohttp
+from dotenv import load_dotenv
+
+from loggers import logger
+
+
+class BitrixClient:
+    """
+    Асинхронный клиент REST API Bitrix24.
+
+    Держит одну сессию aiohttp с пулом keep-alive соединений, ограничивает число одновременных
+    запросов и загрузок файлов семафорами и задаёт таймаут на каждый запрос.
+    """
+
+    def __init__(self) -> None:
+        load_dotenv()
+        self.__webhook = os.getenv("BITRIX_WEBHOOK")
+        self.__portal = os.getenv("BITRIX_URL")
+        self.concurrency = int(os.getenv("BITRIX_CONCURRENCY", 4))
+        self.download_concurrency = int(os.getenv("BITRIX_DOWNLOAD_CONCURRENCY", 4))
+        self.timeout = aiohttp.ClientTimeout(total=float(os.getenv("BITRIX_TIMEOUT", 30)))
+        self.download_timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout.total)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.download_semaphore = asyncio.Semaphore(self.download_concurrency)
+        self.session: aiohttp.ClientSession | None = None
+
+    def get_method_url(self, method: str) -> str:
+        """
+        Формирует URL метода REST API.
+
+        :param method: Метод API.
+        :return: Полный URL метода.
+        """
+        return f"{self.__portal}/rest/{self.__webhook}/{method}.json"
+
+    @staticmethod
+    def prepare_params(params: dict | None) -> dict:
+        """
+        Приводит параметры запроса к строкам и отбрасывает пустые значения, как это делает requests.
+
+        :param params: Параметры запроса.
+        :return: Параметры, пригодные для передачи в aiohttp.
+        """
+        if not params:
+            return {}
+        return {key: str(value) for key, value in params.items() if value is not None}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает сессию клиента, создавая её при первом обращении.
+
+        :return: Сессия aiohttp.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency + self.download_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self) -> None:
+        """Закрывает сессию и все открытые соединения."""
+
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def request(
+            self,
+            http_method: str,
+            url: str | None = None,
+            method: str | None = None,
+            params: dict | None = None,
+            data: dict | None = None,
+            timeout: float | None = None,
+    ) -> dict | None:
+        """
+        Выполняет запрос к API Bitrix и возвращает ответ в формате JSON.
+
+        :param http_method: HTTP-метод (GET или POST).
+        :param url: URL для запроса. Если не указан, используется URL метода API.
+        :param method: Метод API.
+        :param params: Параметры запроса.
+        :param data: Параметры, передаваемые в теле запроса.
+        :param timeout: Таймаут запроса в секундах. Если не указан, используется таймаут клиента.
+        :return: Ответ API или None, если запрос завершился ошибкой.
+        """
+        result = None
+        if url is None:
+            url = self.get_method_url(method)
+        request_kwargs = {"params": self.prepare_params(params)}
+        if data is not None:
+            request_kwargs["data"] = self.prepare_params(data)
+        if timeout is not None:
+            request_kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        try:
+            async with self.semaphore:
+                async with self.get_session().request(http_method, url, **request_kwargs) as response:
+                    if response.status == 200:
+                        result = await response.json(content_type=None)
+                    else:
+                        logger.error(f"Ошибка при выполнении запроса. Код состояния: {response.status}")
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+        finally:
+            return result
+
+    async def get(
+            self,
+            url: str | None = None,
+            method: str | None = None,
+            params: dict | None = None,
+            timeout: float | None = None,
+    ) -> dict | None:
+        """
+        Выполняет GET-запрос к API Bitrix.
+
+        :param url: URL для запроса. Если не указан, используется URL метода API.
+        :param method: Метод API.
+        :param params: Параметры запроса.
+        :param timeout: Таймаут запроса в секундах.
+        :return: Ответ API или None.
+        """
+        return await self.request("GET", url=url, method=method, params=params, timeout=timeout)
+
+    async def post(
+            self,
+            method: str,
+            params: dict | None = None,
+            data: dict | None = None,
+            timeout: float | None = None,
+    ) -> dict | None:
+        """
+        Выполняет POST-запрос к API Bitrix.
+
+        :param method: Метод API.
+        :param params: Параметры запроса.
+        :param data: Параметры, передаваемые в теле запроса.
+        :param timeout: Таймаут запроса в секундах.
+        :return: Ответ API или None.
+        """
+        return await self.request("POST", method=method, params=params, data=data, timeout=timeout)
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: dict | None = None) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Открывает потоковую загрузку по ссылке. Число одновременных загрузок ограничено отдельным семафором,
+        а таймаут применяется к чтению каждого фрагмента, а не ко всей загрузке.
+
+        :param url: Ссылка для скачивания.
+        :param headers: Дополнительные заголовки запроса.
+        :return: Ответ сервера, содержимое которого читается по частям.
+        """
+        async with self.download_semaphore:
+            async with self.get_session().get(url, headers=headers, timeout=self.download_timeout) as response:
+                yield response
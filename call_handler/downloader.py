@@ -0,0 +1,69 @@
+import os
+
+from call_handler.bitrix_client import BitrixClient
+from config import PATH_PROJECT
+from loggers import logger
+
+
+class RecordingDownloader:
+    """
+    Скачивает записи звонков на локальный диск.
+
+    Запись пишется по частям во временный файл .part и атомарно переименовывается после завершения загрузки.
+    Если файл уже скачан целиком, загрузка пропускается, а недокачанный файл докачивается с места обрыва.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, client: BitrixClient) -> None:
+        self.client = client
+        self.output_path = os.path.join(PATH_PROJECT, "audio")
+
+    async def download(self, download_url: str, filename: str, expected_size: int | None = None) -> bool:
+        """
+        Скачивает запись звонка.
+
+        :param download_url: Ссылка для скачивания файла.
+        :param filename: Имя файла.
+        :param expected_size: Ожидаемый размер файла в байтах (поле SIZE метода disk.file.get).
+        :return: Возвращает True или False, в зависимости от того,
+        успешно или нет прошла запись файла на локальный диск.
+        """
+        save_result = False
+        file_path = os.path.join(self.output_path, filename)
+        part_path = f"{file_path}.part"
+        if expected_size and os.path.isfile(file_path) and os.path.getsize(file_path) == expected_size:
+            logger.info(f"[+] Запись разговора {filename} уже скачана, загрузка пропущена")
+            return True
+        try:
+            if not os.path.exists(self.output_path):
+                raise FileExistsError("Папка, для сохранения записей, не найдена")
+            resume_from = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+            if not expected_size or resume_from >= expected_size:
+                resume_from = 0
+            headers = {"Range": f"bytes={resume_from}-"} if resume_from else None
+            async with self.client.stream(download_url, headers=headers) as response:
+                if response.status == 206 and resume_from:
+                    file_mode = "ab"
+                elif response.status == 200:
+                    file_mode = "wb"
+                else:
+                    raise ValueError(f"Ошибка при скачивании {filename}. Код состояния: {response.status}")
+                with open(part_path, file_mode) as file:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        file.write(chunk)
+            downloaded_size = os.path.getsize(part_path)
+            if expected_size and downloaded_size != expected_size:
+                raise ValueError(f"Запись {filename} скачана не полностью: {downloaded_size} из {expected_size} байт")
+            os.replace(part_path, file_path)
+        except FileExistsError as file_ex:
+            logger.error(f"{file_ex.__class__.__name__}: {file_ex}", exc_info=True)
+        except ValueError as val_ex:
+            logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+        else:
+            logger.info(f"[+] Запись разговора {filename} успешно скачана")
+            save_result = True
+        finally:
+            return save_result
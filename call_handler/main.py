@@ -1,14 +1,65 @@
 import asyncio
+from contextlib import aclosing
 
+from call_handler.bitrix_client import BitrixClient
 from call_handler.rest_bitrix_get import BitrixGet
 from call_handler.rest_bitrix_post import BitrixPost
-from config import LISTEN_USERS, USER_DATE
+from config import BITRIX_POLL_SECONDS, LISTEN_USERS, USER_CACHE_TTL, USER_DATE
 from db.db_call_data import CallData
-from db.db_user_data import UserData
+from db.db_connector import BaseConnector
+from db.db_notify import CALL_ANALYZED_CHANNEL, NotificationListener
+from db.db_user_data import UserData, UserDirectory
 from db.db_utils import GeneralDB
 from loggers import logger
 
 
+async def save_new_calls(
+        calls: list[dict],
+        bitrix_get: BitrixGet,
+        call_db: CallData,
+        user_directory: UserDirectory,
+) -> None:
+    """
+    Фильтрует страницу звонков, отбрасывает уже сохранённые звонки одним запросом к БД,
+    обогащает новые звонки данными из Битрикс24, скачивает записи и сохраняет звонки в базу данных.
+
+    :param calls: Страница звонков из Битрикс24.
+    :param bitrix_get: Экземпляр BitrixGet.
+    :param call_db: Экземпляр CallData.
+    :param user_directory: Кэш справочника сотрудников.
+    """
+    candidate_calls = [
+        call for call in calls
+        if (
+            call["RECORD_FILE_ID"]
+            and call["PORTAL_USER_ID"] in LISTEN_USERS
+            and call["CRM_ENTITY_TYPE"] in ("LEAD", "CONTACT", "COMPANY")
+        )
+    ]
+    if not candidate_calls:
+        return
+    existing_ids = await call_db.get_existing_call_ids([call["ID"] for call in candidate_calls])
+    new_calls = [call for call in candidate_calls if call["ID"] not in existing_ids]
+    if not new_calls:
+        return
+    enrichment = await bitrix_get.get_calls_enrichment(new_calls)
+    file_names = await asyncio.gather(
+        *(bitrix_get.save_record(call["RECORD_FILE_ID"], enrichment[call["ID"]]["file_info"]) for call in new_calls)
+    )
+    calls_for_insert = []
+    for call, file_name in zip(new_calls, file_names):
+        call_info = enrichment[call["ID"]]
+        user_fio = await user_directory.get_full_name(int(call["PORTAL_USER_ID"]))
+        calls_for_insert.append({
+            "call": call,
+            "portal_user_name": user_fio,
+            "deal_id": call_info["deal_id"],
+            "file_name": file_name,
+            "deal_stage": call_info["deal_stage"],
+        })
+    await call_db.insert_calls(calls_for_insert)
+
+
 async def main() -> None:
     """
     Основная функция для обработки данных из Bitrix24 и их сохранения в базе данных.
@@ -16,17 +67,20 @@ async def main() -> None:
     Создает экземпляры классов BitrixAPI и BitrixData, устанавливает соединение с базой данных,
     запускает метод создания таблиц.
     Обновляет данные опрашиваемых сотрудников
-    В цикле:
+    В цикле (сразу после уведомления о проанализированном звонке или раз в BITRIX_POLL_SECONDS):
     - Проверяет и передаёт новые данные в Битрикс24
-    - Получает информацию о звонках из Битрикс24, фильтрует их, и сохраняет в базу данных.
+    - Постранично получает информацию о звонках из Битрикс24, фильтрует их, и сохраняет в базу данных.
     """
     logger.info("[+] Start call handler")
-    bitrix_get = BitrixGet()
-    bitrix_post = BitrixPost()
+    bitrix_client = BitrixClient()
+    bitrix_get = BitrixGet(bitrix_client)
+    bitrix_post = BitrixPost(bitrix_client)
     call_db = CallData()
     general_db = GeneralDB()
     user_db = UserData()
     await call_db.create_tables()
+    listener = NotificationListener(CALL_ANALYZED_CHANNEL)
+    await listener.start()
 
     tmp_start_date = await call_db.get_start_date()
     if not tmp_start_date:
@@ -34,53 +88,46 @@ async def main() -> None:
     tmp_start_date = USER_DATE
 
     db_users_id = await user_db.get_users_id()
-    for user_id in LISTEN_USERS:
-        user_info = bitrix_get.get_user_data(user_id)
-        if user_info is not None:
+    users_info = await asyncio.gather(*(bitrix_get.get_user_data(user_id) for user_id in LISTEN_USERS))
+    for user_info in users_info:
+        if user_info:
             if user_info[0]["ID"] in db_users_id:
                 await user_db.update_user(user_info[0])
             else:
                 await user_db.insert_user(user_info[0])
+    user_directory = UserDirectory(user_db, ttl=USER_CACHE_TTL)
+    await user_directory.refresh()
 
-    while True:
-        try:
-            transfer_list_to_bitrix = await general_db.get_calls_data_for_send_bitrix()
-            if transfer_list_to_bitrix:
-                for data in transfer_list_to_bitrix:
-                    status_result = bitrix_post.post_element(call_analysis_info=data)
-                    if status_result is not None:
-                        await call_db.update_status(data["call_id"], "SEND_STATUS", "[+]")
+    try:
+        while True:
+            try:
+                transfer_list_to_bitrix = await general_db.get_calls_data_for_send_bitrix()
+                if transfer_list_to_bitrix:
+                    send_results = await asyncio.gather(
+                        *(bitrix_post.post_element(call_analysis_info=data) for data in transfer_list_to_bitrix)
+                    )
+                    sent_ids = [
+                        data["call_id"] for data, status_result in zip(transfer_list_to_bitrix, send_results)
+                        if status_result
+                    ]
+                    await call_db.update_status_batch(sent_ids, "SEND_STATUS", "[+]")
 
-            last_calls_id = await call_db.get_id_calls()
-            response_call = bitrix_get.get_call_list(start_date=tmp_start_date)
-            if response_call is None:
-                raise ValueError("Не был получен список с информацией по звонкам")
-            for count, call in enumerate(response_call, start=1):
-                if (
-                    call["ID"] not in last_calls_id
-                    and call["RECORD_FILE_ID"]
-                    and call["PORTAL_USER_ID"] in LISTEN_USERS
-                    and call["CRM_ENTITY_TYPE"] in ("LEAD", "CONTACT", "COMPANY")
-                ):
-                    deal_id = bitrix_get.get_deal_id(call["CRM_ENTITY_TYPE"], call["CRM_ENTITY_ID"])
-                    deal_stage = bitrix_get.get_deal_stage(deal_id=deal_id) if deal_id else None
-                    file_name = bitrix_get.get_filename(call["RECORD_FILE_ID"])
-                    user_data = await user_db.get_user_info(int(call["PORTAL_USER_ID"]))
-                    user_fio = f'{user_data["last_name"]} {user_data["first_name"]}' if user_data else None
-                    await call_db.insert_data(call=call,
-                                              portal_user_name=user_fio,
-                                              deal_id=deal_id,
-                                              file_name=file_name,
-                                              deal_stage=deal_stage)
-        except ValueError as val_ex:
-            logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        else:
-            tmp_start_date = response_call[-1]["CALL_START_DATE"]
-        finally:
-            logger.info("PAUSE: call_handler sleep 5min")
-            await asyncio.sleep(300)
+                async with aclosing(bitrix_get.get_call_list(start_date=tmp_start_date)) as calls_pages:
+                    async for calls_page in calls_pages:
+                        await save_new_calls(calls_page, bitrix_get, call_db, user_directory)
+                        if calls_page:
+                            tmp_start_date = calls_page[-1]["CALL_START_DATE"]
+            except ValueError as val_ex:
+                logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
+            except Exception as ex:
+                logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+            finally:
+                logger.info("PAUSE: call_handler waits for analyzed calls or the next Bitrix poll")
+                await listener.wait(BITRIX_POLL_SECONDS)
+    finally:
+        await listener.close()
+        await bitrix_client.close()
+        await BaseConnector.close_pool()
 
 
 if __name__ == "__main__":
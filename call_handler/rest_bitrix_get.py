@@ -1,51 +1,40 @@
-import os
+import asyncio
+from typing import AsyncIterator
+from urllib.parse import urlencode
 
-import requests
-from dotenv import load_dotenv
-
-from config import PATH_PROJECT
+from call_handler.bitrix_client import BitrixClient
+from call_handler.downloader import RecordingDownloader
 from loggers import logger
 
 
 class BitrixGet:
     """Класс для взаимодействия с API Bitrix24 и получения информации."""
 
-    def __init__(self) -> None:
-        load_dotenv()
-        self.__webhook = os.getenv("BITRIX_WEBHOOK")
-        self.__portal = os.getenv("BITRIX_URL")
+    def __init__(self, client: BitrixClient) -> None:
+        self.client = client
+        self.downloader = RecordingDownloader(client)
         self.methods = {
             "call_list": "voximplant.statistic.get",
             "deal_list": "crm.deal.list",
             "deal_info": "crm.deal.get",
             "file_info": "disk.file.get",
             "user_info": "user.get",
+            "batch": "batch",
         }
+        self.batch_limit = 50
 
-    def get_response(self, url: str | None = None, method: str = None, params: dict = None) -> requests.Response | None:
+    async def get_response(self, url: str | None = None, method: str = None, params: dict = None) -> dict | None:
         """
         Выполняет GET-запрос к API Bitrix.
 
         :param url: URL для запроса. Если не указан, используется стандартный URL.
         :param method: Метод API.
         :param params: Параметры запроса.
-        :return: Возвращаем ответ сайта.
+        :return: Возвращаем ответ сайта в формате JSON.
         """
-        result = None
-        if url is None:
-            url = f"{self.__portal}/rest/{self.__webhook}/{method}.json"
-        try:
-            response = requests.get(url=url, params=params)
-            if response.status_code == 200:
-                result = response
-            else:
-                logger.error(f"Ошибка при выполнении запроса. Код состояния: {response.status_code}")
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        finally:
-            return result
+        return await self.client.get(url=url, method=method, params=params)
 
-    def get_user_data(self, user_id: str) -> list[dict] | None:
+    async def get_user_data(self, user_id: str) -> list[dict] | None:
         """
         Получает информацию о сотруднике по API Bitrix.
 
@@ -56,7 +45,7 @@ class BitrixGet:
         params = {"ID": user_id}
         method = self.methods["user_info"]
         try:
-            response_data = self.get_response(method=method, params=params).json()
+            response_data = await self.get_response(method=method, params=params)
             if response_data:
                 result = response_data["result"]
         except Exception as ex:
@@ -64,114 +53,133 @@ class BitrixGet:
         finally:
             return result
 
-    def get_call_list(self, start_date: str) -> list[dict] | None:
+    async def get_call_list(self, start_date: str) -> AsyncIterator[list[dict]]:
         """
-        Получает информацию о звонках по API Bitrix.
+        Получает информацию о звонках по API Bitrix постранично, следуя курсору start до последней страницы.
+        Запрос следующей страницы отправляется до того, как текущая страница отдана на обработку.
 
         :param start_date: Указываем с какой даты начинаем собирать записи.
-        :return: Результат запроса в виде JSON списка со звонками.
+        :return: Асинхронный генератор страниц со звонками (до 50 звонков на странице).
         """
-        result = None
         params = {"filter[>=CALL_START_DATE]": start_date, "SORT": "ID", "ORDER": "ASC"}
         method = self.methods["call_list"]
+        next_page = asyncio.create_task(self.get_response(method=method, params={**params, "start": 0}))
         try:
-            response_data = self.get_response(method=method, params=params).json()
-            if response_data:
-                result = response_data["result"]
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+            while next_page is not None:
+                response_data = await next_page
+                next_page = None
+                if not response_data or "result" not in response_data:
+                    raise ValueError("Не был получен список с информацией по звонкам")
+                if response_data.get("next"):
+                    next_params = {**params, "start": response_data["next"]}
+                    next_page = asyncio.create_task(self.get_response(method=method, params=next_params))
+                logger.info(
+                    f"[+] Получена страница звонков: {len(response_data['result'])} "
+                    f"из {response_data.get('total', len(response_data['result']))}"
+                )
+                yield response_data["result"]
         finally:
-            return result
+            if next_page is not None:
+                next_page.cancel()
 
-    def get_deal_id(self, entity_type: str, entity_id: str) -> str | None:
+    async def get_batch(self, commands: dict[str, str]) -> dict:
         """
-        Получает id сделки по API Bitrix.
+        Выполняет до 50 команд API Bitrix одним запросом batch.
 
-        :param entity_type: Тип сущности (например, 'LEAD').
-        :param entity_id: id сущности.
-        :return: id сделки или None.
+        :param commands: Словарь вида {ключ команды: "метод?параметры"}.
+        :return: Словарь вида {ключ команды: результат}. Команды, завершившиеся ошибкой, в результат не попадают.
         """
-        result = None
-        crm_entity_type = f"filter[{entity_type}_ID]"
-        crm_entity_id = int(entity_id)
-        params = {crm_entity_type: crm_entity_id}
-        method = self.methods["deal_list"]
+        result = {}
+        method = self.methods["batch"]
+        data = {"halt": 0}
+        data.update({f"cmd[{key}]": command for key, command in commands.items()})
         try:
-            response_data = self.get_response(method=method, params=params).json()
-            if response_data["result"]:
-                result = response_data["result"][0]["ID"]
+            if len(commands) > self.batch_limit:
+                raise ValueError(f"В batch-запросе не может быть больше {self.batch_limit} команд")
+            response_data = await self.client.post(method=method, data=data)
+            if response_data:
+                result = response_data["result"]["result"] or {}
+                for key, error in (response_data["result"]["result_error"] or {}).items():
+                    logger.debug(f"Ошибка команды batch {key}: {error}")
+        except ValueError as val_ex:
+            logger.error(f"{val_ex.__class__.__name__}: {val_ex}")
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
             return result
 
-    def get_deal_stage(self, deal_id: str) -> str | None:
+    def get_enrichment_commands(self, call: dict) -> dict[str, str]:
         """
-        Получает стадию сделки по API Bitrix.
+        Формирует команды batch для получения сделки, её стадии и файла записи звонка.
+        Стадия сделки запрашивается по ссылке $result на результат поиска сделки в том же batch.
 
-        :param deal_id: id сделки.
-        :return: Статус сделки или None.
+        :param call: Информация о звонке.
+        :return: Словарь команд batch.
         """
-        result = None
-        params = {"ID": deal_id}
-        method = self.methods["deal_info"]
-        try:
-            response_data = self.get_response(method=method, params=params).json()
-            if response_data:
-                result = response_data["result"]["STAGE_ID"]
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        finally:
-            return result
+        call_id = call["ID"]
+        deal_filter = f"filter[{call['CRM_ENTITY_TYPE']}_ID]"
+        deal_params = urlencode({deal_filter: int(call["CRM_ENTITY_ID"]), "select[]": "ID"})
+        file_params = urlencode({"id": call["RECORD_FILE_ID"]})
+        return {
+            f"deal_{call_id}": f"{self.methods['deal_list']}?{deal_params}",
+            f"stage_{call_id}": f"{self.methods['deal_info']}?ID=$result[deal_{call_id}][0][ID]",
+            f"file_{call_id}": f"{self.methods['file_info']}?{file_params}",
+        }
 
-    def get_filename(self, call_id: int) -> str | None:
+    async def get_calls_enrichment(self, calls: list[dict]) -> dict[str, dict]:
         """
-        Получает имя файла и ссылку для скачивания по API Bitrix.
+        Получает сделку, стадию сделки и информацию о файле записи сразу для списка звонков,
+        упаковывая запросы в batch-вызовы по 50 команд.
 
-        :param call_id: id звонка.
-        :return: Если запись звонка успешно сохранена, то возвращает имя файла, иначе, возвращает None.
+        :param calls: Список звонков.
+        :return: Словарь вида {id звонка: {"deal_id", "deal_stage", "file_info"}}.
         """
-        result = None
-        method = self.methods["file_info"]
-        params = {"id": call_id}
-        try:
-            response_data = self.get_response(method=method, params=params).json()
-            if response_data["result"]:
-                response_name = response_data["result"]["NAME"]
-                filename = f"{call_id}_{response_name}"
-                download_url = response_data["result"]["DOWNLOAD_URL"]
-                save_result = self.saved_file(download_url, filename)
-                if save_result:
-                    result = filename
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        finally:
-            return result
+        result = {}
+        commands_per_call = 3
+        calls_per_batch = self.batch_limit // commands_per_call
+        batches = []
+        for start in range(0, len(calls), calls_per_batch):
+            commands = {}
+            for call in calls[start:start + calls_per_batch]:
+                commands.update(self.get_enrichment_commands(call))
+            batches.append(commands)
+        batch_results = {}
+        for batch_result in await asyncio.gather(*(self.get_batch(commands) for commands in batches)):
+            batch_results.update(batch_result)
+        for call in calls:
+            call_id = call["ID"]
+            deal_list = batch_results.get(f"deal_{call_id}")
+            deal_info = batch_results.get(f"stage_{call_id}")
+            result[call_id] = {
+                "deal_id": deal_list[0]["ID"] if deal_list else None,
+                "deal_stage": deal_info["STAGE_ID"] if deal_list and deal_info else None,
+                "file_info": batch_results.get(f"file_{call_id}") or None,
+            }
+        return result
+
+    async def save_record(self, file_id: int | str, file_info: dict | None) -> str | None:
+        """
+        Скачивает запись звонка по информации о файле, полученной методом disk.file.get.
 
-    def saved_file(self, download_url: str, filename: str) -> bool:
+        :param file_id: id файла записи звонка.
+        :param file_info: Информация о файле.
+        :return: Если запись звонка успешно сохранена, то возвращает имя файла, иначе, возвращает None.
+        """
+        if not file_info:
+            return None
+        filename = f"{file_id}_{file_info['NAME']}"
+        expected_size = int(file_info["SIZE"]) if file_info.get("SIZE") else None
+        save_result = await self.saved_file(file_info["DOWNLOAD_URL"], filename, expected_size)
+        return filename if save_result else None
+
+    async def saved_file(self, download_url: str, filename: str, expected_size: int | None = None) -> bool:
         """
         Получает запись звонка по API Bitrix и сохраняет её на локальный диск
 
         :param download_url: Ссылка для скачивания файла.
         :param filename: Имя файла.
+        :param expected_size: Ожидаемый размер файла в байтах.
         :return: Возвращает True или False, в зависимости от того,
         успешно или нет прошла запись файла на локальный диск.
         """
-        save_result = False
-        output_path = os.path.join(PATH_PROJECT, "audio")
-        if not os.path.exists(output_path):
-            raise FileExistsError("Папка, для сохранения записей, не найдена")
-        try:
-            response_file = self.get_response(url=download_url)
-            if response_file is not None:
-                with open(f"{output_path}/{filename}", "wb") as file:
-                    file.write(response_file.content)
-        except FileExistsError as file_ex:
-            logger.error(f"{file_ex.__class__.__name__}: {file_ex}", exc_info=True)
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        else:
-            logger.info(f"[+] Запись разговора {filename} успешно скачана")
-            save_result = True
-        finally:
-            return save_result
+        return await self.downloader.download(download_url, filename, expected_size)
@@ -1,25 +1,20 @@
-import os
 import uuid
 
-import requests
-from dotenv import load_dotenv
-
+from call_handler.bitrix_client import BitrixClient
 from loggers import logger
 
 
 class BitrixPost:
     """Класс для взаимодействия с API Bitrix24 и получения информации."""
 
-    def __init__(self) -> None:
-        load_dotenv()
-        self.__webhook = os.getenv("BITRIX_WEBHOOK")
-        self.__portal = os.getenv("BITRIX_URL")
+    def __init__(self, client: BitrixClient) -> None:
+        self.client = client
         self.methods = {
             "add_element": "lists.element.add",
             "update_element": "lists.element.update",
         }
 
-    def post_element(self, call_analysis_info: dict) -> bool:
+    async def post_element(self, call_analysis_info: dict) -> bool:
         """
         Метод публикует результаты оценки качества звонка в Битрикс24.
 
@@ -29,7 +24,6 @@ class BitrixPost:
         status_result = False
         method = self.methods["add_element"]
         element_code = uuid.uuid4()
-        url = f"{self.__portal}/rest/{self.__webhook}/{method}.json"
         params = {
             "IBLOCK_ID": 110,
             "IBLOCK_TYPE_ID": "bitrix_processes",
@@ -50,11 +44,12 @@ class BitrixPost:
             "FIELDS[PROPERTY_1020]": call_analysis_info["recommendations"],
         }
         try:
-            response = requests.post(url=url, params=params)
-            if response.status_code == 200:
-                status_result = True
-            else:
-                logger.error(f"Ошибка при выполнении запроса. Код состояния: {response.status_code}")
+            response = await self.client.post(method=method, params=params)
+            if response is None:
+                raise ValueError(f'Результаты анализа звонка ({call_analysis_info["call_id"]}) не переданы в битрикс')
+            status_result = True
+        except ValueError as val_ex:
+            logger.error(f"{val_ex.__class__.__name__}: {val_ex}")
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         else:
@@ -4,8 +4,60 @@ PATH_PROJECT = os.path.dirname(os.path.abspath(__file__))
 
 LISTEN_USERS = ["118", "31017", "85", "4325", "3683", "177", "176", "55"]
 
+# Время жизни кэша справочника сотрудников в секундах
+USER_CACHE_TTL = 3600
+
 USER_DATE = "2023-11-07T05:20:13+03:00"
 
+WHISPER_MODEL = "large"
+
+# Движок транскрибации: "whisper" - эталонный openai-whisper (PyTorch, fp32),
+# "faster-whisper" - CTranslate2 с квантованием int8 на CPU
+TRANSCRIBE_ENGINE = "whisper"
+
+# Модели Whisper от самой точной к самой быстрой и их коэффициент реального времени на одном воркере
+# (секунд инференса на секунду записи). Модель для пачки звонков выбирается так, чтобы с учётом очереди
+# транскрибация укладывалась в TRANSCRIBE_LATENCY_TARGET_SECONDS
+WHISPER_MODEL_TIERS = {"large": 1.0, "medium": 0.5, "small": 0.2, "base": 0.08}
+TRANSCRIBE_LATENCY_TARGET_SECONDS = 1800
+# Количество моделей, одновременно хранимых в памяти воркера
+WORKER_MAX_MODELS = 2
+
+# 0 - транскрибация в текущем процессе, N > 0 - пул из N процессов, каждый со своей моделью
+TRANSCRIBE_WORKERS = 4
+TORCH_THREADS_PER_WORKER = 8
+
+# Предобработка записей: детектор речи WebRTC (агрессивность 0-3), паузы короче MIN_SILENCE_SECONDS
+# не вырезаются, участки речи расширяются на SPEECH_PAD_SECONDS
+VAD_AGGRESSIVENESS = 2
+MIN_SILENCE_SECONDS = 1.0
+SPEECH_PAD_SECONDS = 0.3
+
+# Каналы стерео-записи транскрибируются раздельно и объединяются с метками говорящих
+SPLIT_STEREO_CHANNELS = True
+CHANNEL_SPEAKERS = {0: "Менеджер", 1: "Клиент"}
+
+# Записи, в которых речи больше LONG_CALL_SECONDS, транскрибируются параллельно чанками по ~CHUNK_SECONDS
+LONG_CALL_SECONDS = 600
+CHUNK_SECONDS = 180
+
+# Версия предобработки и сборки транскрибации, входит в ключ кэша транскрибаций.
+# Увеличивается при изменениях, после которых сохранённые результаты нельзя переиспользовать
+TRANSCRIBE_PIPELINE_VERSION = 1
+
+# Срок аренды захваченного в работу звонка, после которого его может забрать другой воркер
+TRANSCRIBE_LEASE_SECONDS = 3600
+ANALYSIS_LEASE_SECONDS = 600
+
+# Бюджет токенов текста разговора в запросе к GPT: более длинные звонки анализируются по частям
+# не длиннее ANALYSIS_CHUNK_TOKENS, а оценки частей объединяются
+ANALYSIS_MAX_TRANSCRIPT_TOKENS = 2500
+ANALYSIS_CHUNK_TOKENS = 2000
+
+# Воркеры просыпаются по уведомлениям БД, а резервный опрос страхует от пропущенных уведомлений
+FALLBACK_POLL_SECONDS = 900
+BITRIX_POLL_SECONDS = 300
+
 EMPTY_DICT_ANSWER = {
     0: {"general_comment": None, "total_score": None},
     1: {"greeting": {"comment": None, "score": None}},
@@ -0,0 +1,104 @@
+import json
+
+from loggers import logger
+from db.db_connector import BaseConnector
+
+
+class CacheData(BaseConnector):
+    """
+    Класс для работы с кэшами: transcription_cache хранит результаты транскрибации по хэшу записи,
+    analysis_cache - ответы GPT по хэшу транскрибации, версии запроса и модели.
+    """
+
+    async def get_transcription(self, audio_hash: str, model_name: str, version: str) -> dict | None:
+        """
+        Возвращает сохранённый результат транскрибации записи.
+
+        :param audio_hash: Хэш содержимого аудиофайла.
+        :param model_name: Имя модели Whisper.
+        :param version: Версия движка и предобработки, которыми получен результат.
+        :return: Результат транскрибации (text, segments) или None, если записи нет в кэше.
+        """
+        result = None
+        try:
+            async with self.acquire() as connection:
+                cached = await connection.fetchrow(
+                    """
+                    SELECT TRANSCRIBE_CALL, SEGMENTS FROM transcription_cache
+                    WHERE AUDIO_HASH = $1 AND MODEL = $2 AND VERSION = $3
+                    """,
+                    audio_hash, model_name, version,
+                )
+            if cached:
+                result = {"text": cached["transcribe_call"], "segments": json.loads(cached["segments"])}
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+        finally:
+            return result
+
+    async def set_transcription(
+            self,
+            audio_hash: str,
+            model_name: str,
+            version: str,
+            transcription_result: dict,
+    ) -> None:
+        """
+        Сохраняет результат транскрибации записи в кэш. Уже сохранённый результат не перезаписывается.
+
+        :param audio_hash: Хэш содержимого аудиофайла.
+        :param model_name: Имя модели Whisper.
+        :param version: Версия движка и предобработки, которыми получен результат.
+        :param transcription_result: Результат транскрибации (text, segments).
+        """
+        try:
+            async with self.acquire() as connection:
+                await connection.execute(
+                    """
+                    INSERT INTO transcription_cache (AUDIO_HASH, MODEL, VERSION, TRANSCRIBE_CALL, SEGMENTS)
+                    VALUES ($1, $2, $3, $4, $5)
+                    ON CONFLICT (AUDIO_HASH, MODEL, VERSION) DO NOTHING
+                    """,
+                    audio_hash, model_name, version,
+                    transcription_result["text"], json.dumps(transcription_result["segments"]),
+                )
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+
+    async def get_analysis(self, cache_key: str) -> str | None:
+        """
+        Возвращает сохранённый ответ GPT.
+
+        :param cache_key: Ключ кэша анализа.
+        :return: Ответ GPT или None, если ответа нет в кэше.
+        """
+        result = None
+        try:
+            async with self.acquire() as connection:
+                result = await connection.fetchval("SELECT ANSWER FROM analysis_cache WHERE CACHE_KEY = $1", cache_key)
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+        finally:
+            return result
+
+    async def set_analysis(self, cache_key: str, model_name: str, prompt_version: int, answer: str) -> None:
+        """
+        Сохраняет ответ GPT в кэш. Уже сохранённый ответ не перезаписывается.
+
+        :param cache_key: Ключ кэша анализа.
+        :param model_name: Имя модели GPT.
+        :param prompt_version: Версия шаблона запроса.
+        :param answer: Ответ GPT.
+        """
+        try:
+            async with self.acquire() as connection:
+                await connection.execute(
+                    """
+                    INSERT INTO analysis_cache (CACHE_KEY, MODEL, PROMPT_VERSION, ANSWER)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (CACHE_KEY) DO NOTHING
+                    """,
+                    cache_key, model_name, prompt_version, answer,
+                )
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
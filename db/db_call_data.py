@@ -1,89 +1,206 @@
 import os
+import socket
 from datetime import timedelta
 
 from loggers import logger
 from db.db_connector import BaseConnector
+from db.db_notify import CALL_ANALYZED_CHANNEL, CALL_INSERTED_CHANNEL, CALL_TRANSCRIBED_CHANNEL
 
 
 class CallData(BaseConnector):
     """Работает со звонками."""
 
-    async def insert_data(
-            self,
+    claim_conditions = {
+        "TRANSCRIBE": "TRANSCRIBE_STATUS IS NULL",
+        "ANALYSIS": "ANALYSIS_STATUS IS NULL AND TRANSCRIBE_STATUS IS NOT NULL",
+    }
+    status_channels = {
+        "TRANSCRIBE_STATUS": CALL_TRANSCRIBED_CHANNEL,
+        "ANALYSIS_STATUS": CALL_ANALYZED_CHANNEL,
+    }
+
+    call_columns = (
+        "CALL_ID", "STAGE", "MANAGER_ID", "PORTAL_USER_NAME", "RECORD_FILE_ID", "TYPE", "DATE",
+        "TIMEZONE", "DURATION", "DURATION_VISUAL", "DEAL_ID", "CRM_ENTITY_TYPE", "CRM_ENTITY_ID", "CRM_ACTIVITY_ID",
+        "PORTAL_NUMBER", "PHONE_NUMBER", "DEAL_URL", "FILE_NAME",
+    )
+
+    @staticmethod
+    def prepare_call_record(
             call: dict,
             portal_user_name: str,
             deal_id: None | str,
             file_name: str,
             deal_stage: None | str
-    ) -> None:
+    ) -> tuple:
         """
-        Вставляет данные о звонке в базу данных.
+        Подготавливает строку таблицы b24_calls из информации о звонке в порядке колонок call_columns.
 
         :param call: Информация о звонке.
         :param portal_user_name: Фамилия, имя сотрудника.
         :param deal_id: Идентификатор сделки.
         :param file_name: Имя файла записи звонка.
         :param deal_stage: Стадия сделки.
+        :return: Кортеж значений колонок.
+        """
+        portal = os.getenv('BITRIX_URL')
+        deal_url = f"{portal}/crm/deal/details/{deal_id}/" if deal_id else None
+        duration_visual = str(timedelta(seconds=float(call["CALL_DURATION"])))
+        if call["CALL_TYPE"] == "1":
+            call_type = "Исходящий"
+        elif call["CALL_TYPE"] == "2":
+            call_type = "Входящий"
+        else:
+            call_type = call["CALL_TYPE"]
+        return (
+            call["ID"],
+            deal_stage,
+            int(call["PORTAL_USER_ID"]),
+            portal_user_name,
+            int(call["RECORD_FILE_ID"]),
+            call_type,
+            call["CALL_START_DATE"],
+            "UTC",
+            int(call["CALL_DURATION"]),
+            duration_visual,
+            deal_id,
+            call["CRM_ENTITY_TYPE"],
+            call["CRM_ENTITY_ID"],
+            call["CRM_ACTIVITY_ID"],
+            call["PORTAL_NUMBER"],
+            call["PHONE_NUMBER"],
+            deal_url,
+            file_name,
+        )
+
+    async def insert_calls(self, calls: list[dict]) -> tuple[int, int]:
+        """
+        Массово вставляет страницу звонков в базу данных.
+
+        Строки загружаются через COPY во временную таблицу, а затем переносятся в b24_calls одним
+        INSERT ... ON CONFLICT (CALL_ID) DO NOTHING, поэтому уже существующие звонки пропускаются.
+        Звонки сотрудников, которых нет в portal_users, и звонки с некорректными данными не вставляются
+        и не мешают вставке остальных: о них пишется предупреждение. Если пачку не удалось вставить
+        целиком, звонки вставляются по одному. Воркер транскрибации уведомляется через NOTIFY один раз
+        на всю пачку. Ошибка подключения к БД пробрасывается, чтобы вызывающий код не сдвигал дату
+        опроса и запросил страницу повторно.
+
+        :param calls: Список словарей с аргументами prepare_call_record
+        (call, portal_user_name, deal_id, file_name, deal_stage).
+        :return: Кортеж из количества вставленных и пропущенных (уже существующих) звонков.
         """
-        await self.connect()
+        inserted, skipped = 0, 0
+        records = []
+        for call in calls:
+            try:
+                records.append(self.prepare_call_record(**call))
+            except (KeyError, TypeError, ValueError) as ex:
+                logger.warning(f"Звонок {call['call'].get('ID')} не сохранён: {ex.__class__.__name__}: {ex}")
+        if not records:
+            return inserted, skipped
         try:
-            portal = os.getenv('BITRIX_URL')
-            deal_url = f"{portal}/crm/deal/details/{deal_id}/" if deal_id else None
-            duration_visual = str(timedelta(seconds=float(call["CALL_DURATION"])))
-            if call["CALL_TYPE"] == "1":
-                call_type = "Исходящий"
-            elif call["CALL_TYPE"] == "2":
-                call_type = "Входящий"
-            else:
-                call_type = call["CALL_TYPE"]
-
-            await self.connection.execute(
-                """INSERT INTO b24_calls (
-                CALL_ID, STAGE, MANAGER_ID, PORTAL_USER_NAME, RECORD_FILE_ID, TYPE, DATE,
-                TIMEZONE, DURATION, DURATION_VISUAL, DEAL_ID, CRM_ENTITY_TYPE, CRM_ENTITY_ID, CRM_ACTIVITY_ID,
-                PORTAL_NUMBER, PHONE_NUMBER, DEAL_URL, FILE_NAME)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18)""",
-                call["ID"],
-                deal_stage,
-                int(call["PORTAL_USER_ID"]),
-                portal_user_name,
-                call["RECORD_FILE_ID"],
-                call_type,
-                call["CALL_START_DATE"],
-                "UTC",
-                int(call["CALL_DURATION"]),
-                duration_visual,
-                deal_id,
-                call["CRM_ENTITY_TYPE"],
-                call["CRM_ENTITY_ID"],
-                call["CRM_ACTIVITY_ID"],
-                call["PORTAL_NUMBER"],
-                call["PHONE_NUMBER"],
-                deal_url,
-                file_name,
-            )
-            logger.info(f"[+] В БД добавлена новая запись о звонке ({call['ID']})")
+            inserted_ids, rejected_ids = await self.copy_calls(records)
         except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        finally:
-            await self.connection.close()
+            logger.warning(
+                f"Пачку из {len(records)} звонков не удалось сохранить одним запросом "
+                f"({ex.__class__.__name__}: {ex}), звонки сохраняются по одному"
+            )
+            inserted_ids, rejected_ids = await self.insert_calls_one_by_one(records)
+        if rejected_ids:
+            logger.warning(f"Звонки не сохранены: {', '.join(rejected_ids)}")
+        inserted = len(inserted_ids)
+        skipped = len(records) - inserted - len(rejected_ids)
+        logger.info(f"[+] В БД добавлено звонков: {inserted}, пропущено (уже существуют): {skipped}")
+        return inserted, skipped
+
+    async def copy_calls(self, records: list[tuple]) -> tuple[list[str], list[str]]:
+        """
+        Вставляет пачку звонков одной транзакцией через COPY во временную таблицу.
+        Строки сотрудников, которых нет в portal_users, не вставляются.
+
+        :param records: Строки таблицы b24_calls в порядке колонок call_columns.
+        :return: Кортеж из списков id вставленных звонков и звонков сотрудников, которых нет в portal_users.
+        """
+        columns = ", ".join(self.call_columns)
+        async with self.acquire() as connection, connection.transaction():
+            await connection.execute(
+                f"""
+                CREATE TEMP TABLE b24_calls_staging ON COMMIT DROP AS
+                SELECT {columns} FROM b24_calls WITH NO DATA
+                """
+            )
+            await connection.copy_records_to_table(
+                "b24_calls_staging", records=records, columns=[column.lower() for column in self.call_columns]
+            )
+            rejected_rows = await connection.fetch(
+                """
+                SELECT CALL_ID FROM b24_calls_staging AS staging
+                WHERE NOT EXISTS (SELECT 1 FROM portal_users WHERE portal_users.MANAGER_ID = staging.MANAGER_ID)
+                """
+            )
+            inserted_rows = await connection.fetch(
+                f"""
+                INSERT INTO b24_calls ({columns})
+                SELECT {columns} FROM b24_calls_staging AS staging
+                WHERE EXISTS (SELECT 1 FROM portal_users WHERE portal_users.MANAGER_ID = staging.MANAGER_ID)
+                ON CONFLICT (CALL_ID) DO NOTHING
+                RETURNING CALL_ID
+                """
+            )
+            if inserted_rows:
+                await connection.execute("SELECT pg_notify($1, $2)", CALL_INSERTED_CHANNEL, str(len(inserted_rows)))
+        return [row["call_id"] for row in inserted_rows], [row["call_id"] for row in rejected_rows]
+
+    async def insert_calls_one_by_one(self, records: list[tuple]) -> tuple[list[str], list[str]]:
+        """
+        Вставляет звонки по одному, чтобы ошибка в одной строке не отменяла вставку остальных.
 
-    async def get_id_calls(self) -> list | list[str]:
+        :param records: Строки таблицы b24_calls в порядке колонок call_columns.
+        :return: Кортеж из списков id вставленных звонков и звонков, которые вставить не удалось.
         """
-        Получает последние 20 id звонков из базы данных.
+        inserted_ids, rejected_ids = [], []
+        columns = ", ".join(self.call_columns)
+        placeholders = ", ".join(f"${index}" for index in range(1, len(self.call_columns) + 1))
+        async with self.acquire() as connection:
+            for record in records:
+                try:
+                    call_id = await connection.fetchval(
+                        f"""
+                        INSERT INTO b24_calls ({columns}) VALUES ({placeholders})
+                        ON CONFLICT (CALL_ID) DO NOTHING
+                        RETURNING CALL_ID
+                        """,
+                        *record,
+                    )
+                    if call_id:
+                        inserted_ids.append(call_id)
+                except Exception as ex:
+                    rejected_ids.append(record[0])
+                    logger.warning(f"Звонок {record[0]} не сохранён: {ex.__class__.__name__}: {ex}")
+            if inserted_ids:
+                await connection.execute("SELECT pg_notify($1, $2)", CALL_INSERTED_CHANNEL, str(len(inserted_ids)))
+        return inserted_ids, rejected_ids
 
-        :return: Список последних id звонков.
+    async def get_existing_call_ids(self, call_ids: list[str]) -> set[str]:
         """
-        id_calls = []
+        Проверяет одним запросом, какие из переданных id звонков уже записаны в базу данных.
+
+        :param call_ids: Список id звонков для проверки.
+        :return: Множество id звонков, которые уже есть в БД.
+        """
+        existing_ids = set()
+        if not call_ids:
+            return existing_ids
         try:
-            await self.connect()
-            result = await self.connection.fetch("SELECT CALL_ID FROM b24_calls ORDER BY ID DESC LIMIT 20")
-            id_calls = [call_id["call_id"] for call_id in result]
+            async with self.acquire() as connection:
+                result = await connection.fetch(
+                    "SELECT CALL_ID FROM b24_calls WHERE CALL_ID = ANY($1::varchar[])", call_ids
+                )
+            existing_ids = {call["call_id"] for call in result}
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
-            await self.connection.close()
-            return id_calls
+            return existing_ids
 
     async def get_start_date(self) -> str:
         """
@@ -93,76 +210,157 @@ class CallData(BaseConnector):
         """
         result_date = ""
         try:
-            await self.connect()
-            result = await self.connection.fetchrow("SELECT DATE FROM b24_calls ORDER BY ID DESC LIMIT 1")
+            async with self.acquire() as connection:
+                result = await connection.fetchrow("SELECT DATE FROM b24_calls ORDER BY ID DESC LIMIT 1")
             if result:
                 result_date = result["date"]
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
-            await self.connection.close()
             return result_date
 
-    async def get_calls_for_transcription(self, count: int = 5) -> list[dict]:
+    @staticmethod
+    def get_worker_id() -> str:
         """
-        Метод получает информацию о звонках из БД для дальнейшей транскрибации.
+        Возвращает идентификатор текущего воркера для захвата звонков в работу.
 
-        :param count: Количество получаемых звонков.
-        :return: Список словарей с информацией о звонках.
+        :return: Строка вида "хост:pid".
+        """
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    async def claim_calls(self, stage: str, worker_id: str, count: int = 5, lease_seconds: int = 3600) -> list[dict]:
+        """
+        Атомарно захватывает звонки в работу на этапе транскрибации или анализа.
+
+        Строки выбираются через FOR UPDATE SKIP LOCKED, поэтому несколько воркеров никогда не получат
+        один и тот же звонок. Захваченным строкам проставляются id воркера и срок аренды. Звонки,
+        аренда которых истекла (например, воркер упал), захватываются повторно.
+
+        :param stage: Этап обработки: "TRANSCRIBE" или "ANALYSIS".
+        :param worker_id: Идентификатор воркера.
+        :param count: Количество захватываемых звонков.
+        :param lease_seconds: Срок аренды в секундах.
+        :return: Список словарей с информацией о захваченных звонках.
         """
         result = []
         try:
-            await self.connect()
-            result = await self.connection.fetch(
-                f"SELECT * FROM b24_calls WHERE TRANSCRIBE_STATUS IS NULL LIMIT {count}"
-            )
+            stage = stage.upper()
+            if stage not in self.claim_conditions:
+                raise ValueError("Захватить звонки на переданном этапе нельзя")
+            async with self.acquire() as connection:
+                claimed = await connection.fetch(
+                    f"""
+                    WITH claimed AS (
+                        SELECT ID, {stage}_WORKER AS PREVIOUS_WORKER
+                        FROM b24_calls
+                        WHERE {self.claim_conditions[stage]}
+                        AND ({stage}_LEASE_UNTIL IS NULL OR {stage}_LEASE_UNTIL < now())
+                        ORDER BY ID
+                        LIMIT $3
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE b24_calls
+                    SET {stage}_WORKER = $1, {stage}_LEASE_UNTIL = now() + make_interval(secs => $2)
+                    FROM claimed
+                    WHERE b24_calls.ID = claimed.ID
+                    RETURNING b24_calls.*, claimed.PREVIOUS_WORKER
+                    """,
+                    worker_id, lease_seconds, count,
+                )
+            for call in claimed:
+                if call["previous_worker"]:
+                    logger.warning(
+                        f"[+] Звонок {call['call_id']} повторно захвачен после истечения аренды "
+                        f"воркера {call['previous_worker']}"
+                    )
+            result = [dict(call) for call in claimed]
+        except ValueError as val_ex:
+            logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
-            await self.connection.close()
             return result
 
-    async def get_calls_for_analysis(self, count: int = 5) -> list | list[str]:
+    async def get_queue_seconds(self, stage: str) -> int:
         """
-        Метод получает список call_id из БД для дальнейшего анализа качества.
+        Возвращает суммарную длительность звонков, ожидающих этапа обработки.
+
+        Учитываются только звонки, которые можно захватить: звонки без записи (FILE_NAME IS NULL)
+        и звонки в действующей аренде (в том числе только что захваченная пачка) не учитываются.
 
-        :param count: Количество получаемых id.
-        :return: Список id непроанализированных звонков
+        :param stage: Этап обработки: "TRANSCRIBE" или "ANALYSIS".
+        :return: Суммарная длительность звонков в очереди в секундах.
         """
-        result_id = []
+        result = 0
         try:
-            await self.connect()
-            result = await self.connection.fetch(
-                f"""SELECT CALL_ID 
-                FROM b24_calls 
-                WHERE ANALYSIS_STATUS IS NULL AND TRANSCRIBE_STATUS IS NOT NULL 
-                LIMIT {count}"""
-            )
-            result_id = [call["call_id"] for call in result]
+            stage = stage.upper()
+            if stage not in self.claim_conditions:
+                raise ValueError("Очередь для переданного этапа не существует")
+            async with self.acquire() as connection:
+                result = await connection.fetchval(
+                    f"""
+                    SELECT COALESCE(sum(DURATION), 0)
+                    FROM b24_calls
+                    WHERE {self.claim_conditions[stage]}
+                    AND FILE_NAME IS NOT NULL
+                    AND ({stage}_LEASE_UNTIL IS NULL OR {stage}_LEASE_UNTIL < now())
+                    """
+                )
+        except ValueError as val_ex:
+            logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
-            await self.connection.close()
-            return result_id
+            return result
 
-    async def update_status(self, call_id: str, name_column: str, status: str) -> None:
+    async def release_calls(self, stage: str, worker_id: str) -> None:
         """
-        Метод обновляет статус в переданной колонке по id звонка в базе данных.
+        Снимает аренду со всех незавершённых звонков воркера, чтобы их сразу могли забрать другие воркеры.
+        Вызывается при штатной остановке воркера.
 
-        :param call_id: Id звонка.
+        :param stage: Этап обработки: "TRANSCRIBE" или "ANALYSIS".
+        :param worker_id: Идентификатор воркера.
+        """
+        try:
+            stage = stage.upper()
+            if stage not in self.claim_conditions:
+                raise ValueError("Освободить звонки на переданном этапе нельзя")
+            async with self.acquire() as connection:
+                await connection.execute(
+                    f"""
+                    UPDATE b24_calls
+                    SET {stage}_WORKER = NULL, {stage}_LEASE_UNTIL = NULL
+                    WHERE {stage}_WORKER = $1 AND {stage}_STATUS IS NULL
+                    """,
+                    worker_id,
+                )
+        except ValueError as val_ex:
+            logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+
+    async def update_status_batch(self, call_ids: list[str], name_column: str, status: str) -> None:
+        """
+        Метод одним запросом обновляет статус в переданной колонке у списка звонков
+        и уведомляет воркер следующего этапа через NOTIFY.
+
+        :param call_ids: Список id звонков.
         :param name_column: Название колонки.
-        :param status: Статус анализа звонка.
+        :param status: Статус звонков.
         """
+        if not call_ids:
+            return
         try:
             if name_column.upper() not in ["TRANSCRIBE_STATUS", "ANALYSIS_STATUS", "SEND_STATUS"]:
                 raise ValueError("Изменить статус в переданной колонке нельзя")
-            await self.connect()
-            await self.connection.execute(
-                f"UPDATE b24_calls SET {name_column} = $1 WHERE CALL_ID = $2", status, call_id,
-            )
+            channel = self.status_channels.get(name_column.upper())
+            async with self.acquire() as connection, connection.transaction():
+                await connection.execute(
+                    f"UPDATE b24_calls SET {name_column} = $1 WHERE CALL_ID = ANY($2::varchar[])", status, call_ids,
+                )
+                if channel:
+                    await connection.execute("SELECT pg_notify($1, $2)", channel, str(len(call_ids)))
         except ValueError as val_ex:
             logger.warning(f"{val_ex.__class__.__name__}: {val_ex}")
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        finally:
-            await self.connection.close()
@@ -1,134 +1,112 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 import asyncpg
 from dotenv import load_dotenv
 
+from db.migrations import MIGRATIONS
 from loggers import logger
 
 
 class BaseConnector:
-    """Подключает к базе данных и создаёт таблицы."""
+    """
+    Подключает к базе данных и создаёт таблицы.
+
+    Все наследники используют один пул соединений asyncpg на процесс: соединение берётся из пула
+    на время одной операции и сразу возвращается обратно.
+    """
+
+    _pool: asyncpg.Pool | None = None
+    _pool_lock = asyncio.Lock()
+    migrations_lock_id = 8769001
 
     def __init__(self) -> None:
-        self.connection = None
         load_dotenv()
         self.database = os.getenv("POSTGRES_DB")
         self.user = os.getenv("POSTGRES_USER")
         self.password = os.getenv("POSTGRES_PASSWORD")
         self.host = os.getenv("POSTGRES_HOST")
         self.port = os.getenv("POSTGRES_PORT")
+        self.pool_min_size = int(os.getenv("POSTGRES_POOL_MIN_SIZE", 1))
+        self.pool_max_size = int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10))
+        self.statement_cache_size = int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", 100))
         logger.info("Database is activated")
 
-    async def connect(self) -> None:
-        """Устанавливает соединение с базой данных."""
+    async def get_pool(self) -> asyncpg.Pool:
+        """
+        Возвращает общий для процесса пул соединений, создавая его при первом обращении.
+
+        :return: Пул соединений asyncpg.
+        """
+        async with BaseConnector._pool_lock:
+            if BaseConnector._pool is None:
+                BaseConnector._pool = await asyncpg.create_pool(
+                    host=self.host,
+                    port=self.port,
+                    database=self.database,
+                    user=self.user,
+                    password=self.password,
+                    min_size=self.pool_min_size,
+                    max_size=self.pool_max_size,
+                    statement_cache_size=self.statement_cache_size,
+                )
+                logger.info(f"[+] Создан пул соединений с БД ({self.pool_min_size}-{self.pool_max_size})")
+        return BaseConnector._pool
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        """Берёт соединение из общего пула на время операции и возвращает его обратно."""
+
+        pool = await self.get_pool()
+        async with pool.acquire() as connection:
+            yield connection
 
-        try:
-            self.connection = await asyncpg.connect(
-                host=self.host, port=self.port, database=self.database, user=self.user, password=self.password
-            )
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+    @classmethod
+    async def close_pool(cls) -> None:
+        """Закрывает общий пул соединений. Вызывается при завершении работы процесса."""
+
+        async with cls._pool_lock:
+            if cls._pool is not None:
+                await cls._pool.close()
+                cls._pool = None
+                logger.info("[+] Пул соединений с БД закрыт")
 
     async def create_tables(self) -> None:
-        """Создает таблицу в базе данных, если она не существует."""
-
-        await self.connect()
-        await self.connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS portal_users(
-                ID SERIAL PRIMARY KEY,
-                MANAGER_ID INT UNIQUE,
-                ACTIVE INT,
-                FIRST_NAME VARCHAR(64),
-                LAST_NAME VARCHAR(64),
-                EMAIL VARCHAR(128),
-                REGION VARCHAR(64)
-            )
-            """
-        )
-
-        await self.connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS b24_calls(
-                ID SERIAL PRIMARY KEY,
-                CALL_ID VARCHAR(32) UNIQUE NOT NULL,
-                STAGE VARCHAR(64),
-                MANAGER_ID INT NOT NULL,
-                PORTAL_USER_NAME VARCHAR(256),
-                RECORD_FILE_ID INT,
-                TYPE VARCHAR(64),
-                DATE VARCHAR(64),
-                TIMEZONE VARCHAR(64),
-                DURATION INT,
-                DURATION_VISUAL VARCHAR(64),
-                DEAL_ID VARCHAR(32),
-                CRM_ENTITY_TYPE VARCHAR(32),
-                CRM_ENTITY_ID VARCHAR(32),
-                CRM_ACTIVITY_ID VARCHAR(32),
-                PORTAL_NUMBER VARCHAR(64),
-                PHONE_NUMBER VARCHAR(64),
-                DEAL_URL VARCHAR(512),
-                FILE_URL VARCHAR(512),
-                FILE_NAME VARCHAR(256),
-                SEND_STATUS VARCHAR(32),
-                TRANSCRIBE_STATUS VARCHAR(32),
-                ANALYSIS_STATUS VARCHAR(32),              
-                FOREIGN KEY (MANAGER_ID) REFERENCES portal_users (MANAGER_ID)
-            )
-            """
-        )
-
-        await self.connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS call_analysis(
-                ID SERIAL PRIMARY KEY,
-                CALL_ID VARCHAR(32),
-                TRANSCRIBE_CALL TEXT,
-                SEGMENTS JSONB,    
-                GENERAL_COMMENT TEXT,
-                CALL_QUALITY NUMERIC(4, 1),             
-                RESUME_MANAGER TEXT,
-                RECOMMENDATIONS TEXT,
-                FOREIGN KEY (CALL_ID) REFERENCES b24_calls (CALL_ID)
-            )
-            """
-        )
-
-        await self.connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS evaluations(
-                ID SERIAL PRIMARY KEY,
-                CALL_ID VARCHAR(32),
-                GREETING INT,
-                SPEECH INT,
-                INITIATIVE INT,
-                NEED INT,
-                OFFER INT,
-                OBJECTION INT,
-                PERSEVERANCE INT,
-                ADVANTAGES INT,
-                AGREEMENT INT,
-                FOREIGN KEY (CALL_ID) REFERENCES b24_calls (CALL_ID)       
-            )
-            """
-        )
-
-        await self.connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS commentary(
-                ID SERIAL PRIMARY KEY,
-                CALL_ID VARCHAR(32),
-                GREETING VARCHAR(1024),
-                SPEECH VARCHAR(1024),
-                INITIATIVE VARCHAR(1024),
-                NEED VARCHAR(1024),
-                OFFER VARCHAR(1024),
-                OBJECTION VARCHAR(1024),
-                PERSEVERANCE VARCHAR(1024),
-                ADVANTAGES VARCHAR(1024),
-                AGREEMENT VARCHAR(1024),
-                FOREIGN KEY (CALL_ID) REFERENCES b24_calls (CALL_ID)
-            )
-            """
-        )
-        await self.connection.close()
+        """Создает таблицы в базе данных и приводит схему к актуальной версии, применяя миграции."""
+
+        await self.migrate()
+
+    async def migrate(self) -> None:
+        """
+        Применяет ещё не применённые миграции из db.migrations.MIGRATIONS.
+
+        Миграции выполняются под advisory-блокировкой, поэтому одновременно стартующие воркеры
+        не применяют одну и ту же миграцию дважды.
+        """
+        async with self.acquire() as connection:
+            await connection.execute("SELECT pg_advisory_lock($1)", self.migrations_lock_id)
+            try:
+                await connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS schema_migrations(
+                        VERSION INT PRIMARY KEY,
+                        DESCRIPTION VARCHAR(256),
+                        APPLIED_AT TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                    """
+                )
+                applied = {row["version"] for row in await connection.fetch("SELECT VERSION FROM schema_migrations")}
+                for version, description, sql in sorted(MIGRATIONS):
+                    if version in applied:
+                        continue
+                    async with connection.transaction():
+                        await connection.execute(sql)
+                        await connection.execute(
+                            "INSERT INTO schema_migrations (VERSION, DESCRIPTION) VALUES ($1, $2)",
+                            version, description,
+                        )
+                    logger.info(f"[+] Применена миграция БД {version}: {description}")
+            finally:
+                await connection.execute("SELECT pg_advisory_unlock($1)", self.migrations_lock_id)
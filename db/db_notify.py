@@ -0,0 +1,76 @@
+import asyncio
+
+import asyncpg
+
+from loggers import logger
+from db.db_connector import BaseConnector
+
+CALL_INSERTED_CHANNEL = "call_inserted"
+CALL_TRANSCRIBED_CHANNEL = "call_transcribed"
+CALL_ANALYZED_CHANNEL = "call_analyzed"
+
+
+class NotificationListener(BaseConnector):
+    """
+    Слушает уведомления PostgreSQL (LISTEN/NOTIFY) и будит воркер, как только появляется новая работа.
+
+    Для LISTEN используется отдельное постоянное соединение вне общего пула, так как при возврате
+    соединения в пул подписки сбрасываются.
+    """
+
+    def __init__(self, *channels: str) -> None:
+        super().__init__()
+        self.channels = channels
+        self.listen_connection: asyncpg.Connection | None = None
+        self.event = asyncio.Event()
+
+    async def start(self) -> None:
+        """Открывает соединение и подписывается на каналы."""
+
+        try:
+            self.listen_connection = await asyncpg.connect(
+                host=self.host, port=self.port, database=self.database, user=self.user, password=self.password
+            )
+            self.listen_connection.add_termination_listener(self.on_termination)
+            for channel in self.channels:
+                await self.listen_connection.add_listener(channel, self.on_notification)
+            logger.info(f"[+] Подписка на уведомления БД: {', '.join(self.channels)}")
+        except Exception as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
+
+    def on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        """Обработчик уведомления: будит ожидающий воркер."""
+
+        logger.debug(f"Получено уведомление {channel}: {payload}")
+        self.event.set()
+
+    def on_termination(self, connection: asyncpg.Connection) -> None:
+        """Обработчик разрыва соединения: будит воркер, чтобы он переподключился."""
+
+        logger.warning("Соединение для уведомлений БД разорвано")
+        self.event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Ждёт уведомления, но не дольше timeout секунд (резервный опрос на случай пропущенных уведомлений).
+        Уведомления, пришедшие во время обработки предыдущей пачки, не теряются: ожидание сразу завершится.
+
+        :param timeout: Максимальное время ожидания в секундах.
+        :return: True, если воркер разбужен уведомлением, False, если истёк таймаут.
+        """
+        if self.listen_connection is None or self.listen_connection.is_closed():
+            await self.start()
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+
+    async def close(self) -> None:
+        """Закрывает соединение для уведомлений."""
+
+        if self.listen_connection is not None and not self.listen_connection.is_closed():
+            await self.listen_connection.close()
+        self.listen_connection = None
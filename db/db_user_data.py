@@ -1,3 +1,5 @@
+import time
+
 from loggers import logger
 from db.db_connector import BaseConnector
 
@@ -11,15 +13,14 @@ class UserData(BaseConnector):
 
         :return: Возвращает список id сотрудников.
         """
-        await self.connect()
         db_users_id = []
         try:
-            db_users = await self.connection.fetch("SELECT manager_id FROM portal_users")
+            async with self.acquire() as connection:
+                db_users = await connection.fetch("SELECT manager_id FROM portal_users")
             db_users_id = [str(user["manager_id"]) for user in db_users]
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
-            await self.connection.close()
             return db_users_id
 
     async def insert_user(self, user: dict) -> None:
@@ -28,19 +29,17 @@ class UserData(BaseConnector):
 
         :param user: Словарь с информацией о сотруднике.
         """
-        await self.connect()
         try:
-            await self.connection.execute(
-                """INSERT INTO portal_users (MANAGER_ID, ACTIVE, FIRST_NAME, LAST_NAME, EMAIL) 
-                VALUES ($1, $2, $3, $4, $5)""",
-                int(user["ID"]), int(user["ACTIVE"]), user["NAME"], user["LAST_NAME"], user["EMAIL"]
-            )
+            async with self.acquire() as connection:
+                await connection.execute(
+                    """INSERT INTO portal_users (MANAGER_ID, ACTIVE, FIRST_NAME, LAST_NAME, EMAIL)
+                    VALUES ($1, $2, $3, $4, $5)""",
+                    int(user["ID"]), int(user["ACTIVE"]), user["NAME"], user["LAST_NAME"], user["EMAIL"]
+                )
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         else:
             logger.info(f'[+] В БД добавлен новый сотрудник ({user["ID"]}: {user["NAME"]} {user["LAST_NAME"]})')
-        finally:
-            await self.connection.close()
 
     async def update_user(self, user: dict) -> None:
         """
@@ -48,34 +47,63 @@ class UserData(BaseConnector):
 
         :param user: Словарь с информацией о сотруднике.
         """
-        await self.connect()
         try:
-            await self.connection.execute(
-                """UPDATE portal_users 
-                SET ACTIVE = $1, FIRST_NAME = $2, LAST_NAME = $3, EMAIL = $4, REGION = $5
-                WHERE MANAGER_ID = $6""",
-                int(user["ACTIVE"]), user["NAME"], user["LAST_NAME"], user["EMAIL"], None, int(user["ID"])
-            )
+            async with self.acquire() as connection:
+                await connection.execute(
+                    """UPDATE portal_users
+                    SET ACTIVE = $1, FIRST_NAME = $2, LAST_NAME = $3, EMAIL = $4, REGION = $5
+                    WHERE MANAGER_ID = $6""",
+                    int(user["ACTIVE"]), user["NAME"], user["LAST_NAME"], user["EMAIL"], None, int(user["ID"])
+                )
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
-        finally:
-            await self.connection.close()
 
-    async def get_user_info(self, manager_id: int) -> dict:
+    async def get_users(self) -> dict[int, dict]:
         """
-        Метод получает информацию о сотруднике из базы данных.
+        Метод получает информацию обо всех сотрудниках из базы данных.
 
-        :param manager_id: ID сотрудника.
-        :return: Возвращает словарь с информацией.
+        :return: Словарь вида {ID сотрудника: информация о сотруднике}.
         """
-        await self.connect()
-        user_info = dict()
+        users = dict()
         try:
-            user_info = dict(
-                await self.connection.fetchrow("SELECT * FROM portal_users WHERE MANAGER_ID = $1", manager_id)
-            )
+            async with self.acquire() as connection:
+                db_users = await connection.fetch("SELECT * FROM portal_users")
+            users = {user["manager_id"]: dict(user) for user in db_users}
         except Exception as ex:
             logger.debug(f"{ex.__class__.__name__}: {ex}", exc_info=True)
         finally:
-            await self.connection.close()
-            return user_info
+            return users
+
+
+class UserDirectory:
+    """
+    Кэш справочника сотрудников портала в памяти процесса.
+
+    Справочник целиком загружается из portal_users и перечитывается по истечении ttl секунд,
+    поэтому получение ФИО - это поиск по словарю.
+    """
+
+    def __init__(self, user_db: UserData, ttl: float) -> None:
+        self.user_db = user_db
+        self.ttl = ttl
+        self.users: dict[int, dict] = {}
+        self.loaded_at: float | None = None
+
+    async def refresh(self) -> None:
+        """Перечитывает справочник из базы данных."""
+
+        self.users = await self.user_db.get_users()
+        self.loaded_at = time.monotonic()
+        logger.info(f"[+] Справочник сотрудников обновлён ({len(self.users)} записей)")
+
+    async def get_full_name(self, manager_id: int) -> str | None:
+        """
+        Возвращает фамилию и имя сотрудника.
+
+        :param manager_id: ID сотрудника.
+        :return: Строка "Фамилия Имя" или None, если сотрудник не найден.
+        """
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            await self.refresh()
+        user = self.users.get(manager_id)
+        return f'{user["last_name"]} {user["first_name"]}' if user else None
@@ -0,0 +1,177 @@
+"""
+Версионированные миграции схемы БД.
+
+Каждая миграция - кортеж (версия, описание, SQL). Миграции применяются по возрастанию версии,
+каждая в своей транзакции, и записываются в таблицу schema_migrations. Уже применённые миграции
+не изменяются: любое изменение схемы оформляется новой миграцией в конце списка.
+"""
+
+MIGRATIONS: list[tuple[int, str, str]] = [
+    (
+        1,
+        "Исходная схема",
+        """
+        CREATE TABLE IF NOT EXISTS portal_users(
+            ID SERIAL PRIMARY KEY,
+            MANAGER_ID INT UNIQUE,
+            ACTIVE INT,
+            FIRST_NAME VARCHAR(64),
+            LAST_NAME VARCHAR(64),
+            EMAIL VARCHAR(128),
+            REGION VARCHAR(64)
+        );
+
+        CREATE TABLE IF NOT EXISTS b24_calls(
+            ID SERIAL PRIMARY KEY,
+            CALL_ID VARCHAR(32) UNIQUE NOT NULL,
+            STAGE VARCHAR(64),
+            MANAGER_ID INT NOT NULL,
+            PORTAL_USER_NAME VARCHAR(256),
+            RECORD_FILE_ID INT,
+            TYPE VARCHAR(64),
+            DATE VARCHAR(64),
+            TIMEZONE VARCHAR(64),
+            DURATION INT,
+            DURATION_VISUAL VARCHAR(64),
+            DEAL_ID VARCHAR(32),
+            CRM_ENTITY_TYPE VARCHAR(32),
+            CRM_ENTITY_ID VARCHAR(32),
+            CRM_ACTIVITY_ID VARCHAR(32),
+            PORTAL_NUMBER VARCHAR(64),
+            PHONE_NUMBER VARCHAR(64),
+            DEAL_URL VARCHAR(512),
+            FILE_URL VARCHAR(512),
+            FILE_NAME VARCHAR(256),
+            SEND_STATUS VARCHAR(32),
+            TRANSCRIBE_STATUS VARCHAR(32),
+            ANALYSIS_STATUS VARCHAR(32),
+            FOREIGN KEY (MANAGER_ID) REFERENCES portal_users (MANAGER_ID)
+        );
+
+        CREATE TABLE IF NOT EXISTS call_analysis(
+            ID SERIAL PRIMARY KEY,
+            CALL_ID VARCHAR(32),
+            TRANSCRIBE_CALL TEXT,
+            SEGMENTS JSONB,
+            GENERAL_COMMENT TEXT,
+            CALL_QUALITY NUMERIC(4, 1),
+            RESUME_MANAGER TEXT,
+            RECOMMENDATIONS TEXT,
+            FOREIGN KEY (CALL_ID) REFERENCES b24_calls (CALL_ID)
+        );
+
+        CREATE TABLE IF NOT EXISTS evaluations(
+            ID SERIAL PRIMARY KEY,
+            CALL_ID VARCHAR(32),
+            GREETING INT,
+            SPEECH INT,
+            INITIATIVE INT,
+            NEED INT,
+            OFFER INT,
+            OBJECTION INT,
+            PERSEVERANCE INT,
+            ADVANTAGES INT,
+            AGREEMENT INT,
+            FOREIGN KEY (CALL_ID) REFERENCES b24_calls (CALL_ID)
+        );
+
+        CREATE TABLE IF NOT EXISTS commentary(
+            ID SERIAL PRIMARY KEY,
+            CALL_ID VARCHAR(32),
+            GREETING VARCHAR(1024),
+            SPEECH VARCHAR(1024),
+            INITIATIVE VARCHAR(1024),
+            NEED VARCHAR(1024),
+            OFFER VARCHAR(1024),
+            OBJECTION VARCHAR(1024),
+            PERSEVERANCE VARCHAR(1024),
+            ADVANTAGES VARCHAR(1024),
+            AGREEMENT VARCHAR(1024),
+            FOREIGN KEY (CALL_ID) REFERENCES b24_calls (CALL_ID)
+        );
+        """,
+    ),
+    (
+        2,
+        "Аренда звонков воркерами транскрибации и анализа",
+        """
+        ALTER TABLE b24_calls
+            ADD COLUMN IF NOT EXISTS TRANSCRIBE_WORKER VARCHAR(128),
+            ADD COLUMN IF NOT EXISTS TRANSCRIBE_LEASE_UNTIL TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS ANALYSIS_WORKER VARCHAR(128),
+            ADD COLUMN IF NOT EXISTS ANALYSIS_LEASE_UNTIL TIMESTAMPTZ;
+        """,
+    ),
+    (
+        3,
+        "Индексы для очередей обработки и связей по CALL_ID",
+        """
+        CREATE INDEX IF NOT EXISTS b24_calls_transcribe_queue_idx
+            ON b24_calls (ID) WHERE TRANSCRIBE_STATUS IS NULL;
+        CREATE INDEX IF NOT EXISTS b24_calls_analysis_queue_idx
+            ON b24_calls (ID) WHERE ANALYSIS_STATUS IS NULL AND TRANSCRIBE_STATUS IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS b24_calls_send_queue_idx
+            ON b24_calls (ID) WHERE ANALYSIS_STATUS IS NOT NULL AND SEND_STATUS IS NULL;
+        CREATE INDEX IF NOT EXISTS call_analysis_call_id_idx ON call_analysis (CALL_ID);
+        CREATE INDEX IF NOT EXISTS evaluations_call_id_idx ON evaluations (CALL_ID);
+        CREATE INDEX IF NOT EXISTS commentary_call_id_idx ON commentary (CALL_ID);
+        """,
+    ),
+    (
+        4,
+        "Модель Whisper, которой выполнена транскрибация",
+        """
+        ALTER TABLE call_analysis ADD COLUMN IF NOT EXISTS MODEL VARCHAR(64);
+        """,
+    ),
+    (
+        5,
+        "Кэш транскрибаций по хэшу содержимого записи",
+        """
+        CREATE TABLE IF NOT EXISTS transcription_cache(
+            AUDIO_HASH CHAR(64) NOT NULL,
+            MODEL VARCHAR(64) NOT NULL,
+            VERSION VARCHAR(128) NOT NULL,
+            TRANSCRIBE_CALL TEXT,
+            SEGMENTS JSONB,
+            CREATED_AT TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (AUDIO_HASH, MODEL, VERSION)
+        );
+        """,
+    ),
+    (
+        6,
+        "Кэш результатов анализа GPT",
+        """
+        CREATE TABLE IF NOT EXISTS analysis_cache(
+            CACHE_KEY CHAR(64) PRIMARY KEY,
+            MODEL VARCHAR(64) NOT NULL,
+            PROMPT_VERSION INT NOT NULL,
+            ANSWER TEXT NOT NULL,
+            CREATED_AT TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """,
+    ),
+    (
+        7,
+        "Одна строка оценок и комментариев на звонок",
+        """
+        DELETE FROM evaluations a USING evaluations b WHERE a.CALL_ID = b.CALL_ID AND a.ID < b.ID;
+        DELETE FROM commentary a USING commentary b WHERE a.CALL_ID = b.CALL_ID AND a.ID < b.ID;
+        DROP INDEX IF EXISTS evaluations_call_id_idx;
+        DROP INDEX IF EXISTS commentary_call_id_idx;
+        ALTER TABLE evaluations ADD CONSTRAINT evaluations_call_id_key UNIQUE (CALL_ID);
+        ALTER TABLE commentary ADD CONSTRAINT commentary_call_id_key UNIQUE (CALL_ID);
+        """,
+    ),
+    (
+        8,
+        "Одна строка транскрибации и анализа на звонок",
+        """
+        DELETE FROM call_analysis a USING call_analysis b
+        WHERE a.CALL_ID = b.CALL_ID AND (a.GENERAL_COMMENT IS NOT NULL, a.ID) < (b.GENERAL_COMMENT IS NOT NULL, b.ID);
+        DROP INDEX IF EXISTS call_analysis_call_id_idx;
+        ALTER TABLE call_analysis ADD CONSTRAINT call_analysis_call_id_key UNIQUE (CALL_ID);
+        """,
+    ),
+]
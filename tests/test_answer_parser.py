@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from analysis_handler.answer_parser import parse_answer, to_score
+
+
+@pytest.mark.parametrize("value", ["NaN", "nan", "inf", "-inf", "Infinity", float("nan"), None, "хорошо"])
+def test_to_score_rejects_non_finite_values(value):
+    assert to_score(value) is None
+
+
+def test_to_score_accepts_decimal_comma():
+    assert to_score("7,5") == 7.5
+
+
+def test_parse_answer_with_nan_score():
+    answer = json.dumps({"greeting": {"score": "NaN", "comment": "Не поздоровался"}, "total_score": "Infinity"})
+
+    result = parse_answer(answer)
+
+    assert result is not None
+    fields = {key: value for block in result.values() for key, value in block.items()}
+    assert fields["greeting"]["score"] is None
+    assert fields["total_score"] is None
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from analysis_handler.compaction import compact_transcript, count_tokens, split_transcript  # noqa: E402
+
+MODEL_NAME = "gpt-3.5-turbo"
+
+
+def test_split_transcript_splits_mono_call():
+    segments = [{"text": f"Фраза номер {index} про условия поставки оборудования."} for index in range(600)]
+    transcript = compact_transcript(segments)
+    assert len(transcript.splitlines()) == 1
+
+    chunks = split_transcript(transcript, 2000, MODEL_NAME)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk, MODEL_NAME) <= 2000 for chunk in chunks)
+    assert " ".join(chunks) == transcript
+
+
+def test_split_transcript_keeps_speaker_on_long_turn():
+    segments = [{"text": f"Фраза номер {index}.", "speaker": "Менеджер"} for index in range(600)]
+    segments.append({"text": "Спасибо.", "speaker": "Клиент"})
+
+    chunks = split_transcript(compact_transcript(segments), 500, MODEL_NAME)
+
+    assert len(chunks) > 1
+    assert all(line.startswith(("Менеджер: ", "Клиент: ")) for chunk in chunks for line in chunk.splitlines())
+    assert chunks[-1].endswith("Клиент: Спасибо.")
+
+
+def test_split_transcript_splits_sentence_without_punctuation():
+    transcript = " ".join(["слово"] * 3000)
+
+    chunks = split_transcript(transcript, 200, MODEL_NAME)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk, MODEL_NAME) <= 200 for chunk in chunks)
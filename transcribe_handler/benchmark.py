@@ -0,0 +1,80 @@
+"""
+Сравнение движков транскрибации по скорости и памяти на CPU.
+
+Каждый движок запускается в отдельном процессе, чтобы пиковая память (max RSS) одного движка
+не искажала замер другого. Запись проходит ту же предобработку, что и в боевом пайплайне
+(декодирование в 16 кГц моно и вырезание пауз), а затем транскрибируется каждым движком.
+
+Пример запуска из корня проекта:
+    python -m transcribe_handler.benchmark audio/call.mp3 --model small --threads 8
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import torch
+
+from transcribe_handler.engines import ENGINES, get_engine_class
+from transcribe_handler.preprocessing import SAMPLE_RATE, cut_speech, decode_audio, detect_speech, load_pcm
+
+
+def run_engine(engine_name: str, model_name: str, input_files: list[str], threads: int) -> dict:
+    """
+    Замеряет один движок на наборе записей. Выполняется в отдельном процессе.
+
+    :param engine_name: Имя движка транскрибации.
+    :param model_name: Имя модели Whisper.
+    :param input_files: Пути к аудиофайлам.
+    :param threads: Количество потоков вычислений.
+    :return: Словарь с результатами замера.
+    """
+    torch.set_num_threads(threads)
+    engine = get_engine_class(engine_name)(model_name)
+    engine.load()
+    audio_seconds = 0.0
+    inference_seconds = 0.0
+    for input_file in input_files:
+        audio = load_pcm(decode_audio(input_file))
+        speech_audio, _ = cut_speech(audio, detect_speech(audio))
+        audio_seconds += len(speech_audio) / SAMPLE_RATE
+        start_time = time.perf_counter()
+        engine.transcribe(speech_audio)
+        inference_seconds += time.perf_counter() - start_time
+    return {
+        "engine": f"{engine_name} ({engine.get_version()})",
+        "load_seconds": engine.load_time,
+        "audio_seconds": audio_seconds,
+        "inference_seconds": inference_seconds,
+        "rtf": inference_seconds / audio_seconds if audio_seconds else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    """Запускает замер выбранных движков и печатает сводную таблицу."""
+
+    parser = argparse.ArgumentParser(description="Сравнение движков транскрибации по скорости и памяти")
+    parser.add_argument("input_files", nargs="+", help="Пути к аудиофайлам")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--model", default="small", help="Имя модели Whisper")
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads(), help="Потоки вычислений")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine_name in args.engines:
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            results.append(pool.apply(run_engine, (engine_name, args.model, args.input_files, args.threads)))
+
+    print(f"Модель: {args.model}, потоков: {args.threads}, файлов: {len(args.input_files)}")
+    print(f"{'Движок':<45} {'Загрузка, с':>12} {'Речь, с':>10} {'Инференс, с':>12} {'RTF':>7} {'Пик RSS, МБ':>12}")
+    for result in results:
+        print(
+            f"{result['engine']:<45} {result['load_seconds']:>12.1f} {result['audio_seconds']:>10.1f} "
+            f"{result['inference_seconds']:>12.1f} {result['rtf']:>7.3f} {result['peak_rss_mb']:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import os
+
+from config import PATH_PROJECT, TRANSCRIBE_PIPELINE_VERSION
+from db.db_cache_data import CacheData
+from loggers import logger
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_audio_hash(input_file: str) -> str:
+    """
+    Считает sha256 содержимого аудиофайла, читая его блоками.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :return: Хэш содержимого в шестнадцатеричном виде.
+    """
+    audio_hash = hashlib.sha256()
+    with open(input_file, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            audio_hash.update(chunk)
+    return audio_hash.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Кэш результатов транскрибации по содержимому записи.
+
+    Ключ кэша - хэш аудиофайла, имя модели и версия (версия движка и TRANSCRIBE_PIPELINE_VERSION),
+    поэтому одна и та же запись, пришедшая повторно (повторная синхронизация, один файл у нескольких
+    сущностей CRM, повторная обработка), не транскрибируется заново.
+    """
+
+    def __init__(self, cache_db: CacheData, engine_version: str) -> None:
+        self.cache_db = cache_db
+        self.version = f"{engine_version}/pipeline-{TRANSCRIBE_PIPELINE_VERSION}"
+        self.hits = 0
+        self.misses = 0
+
+    async def get_key(self, filename: str | None) -> str | None:
+        """
+        Считает хэш аудиофайла в отдельном потоке, чтобы не блокировать цикл asyncio.
+
+        :param filename: Имя аудиофайла (None, если запись не удалось скачать).
+        :return: Хэш содержимого или None, если файл не удалось прочитать.
+        """
+        if not isinstance(filename, str):
+            return None
+        try:
+            return await asyncio.to_thread(get_audio_hash, os.path.join(PATH_PROJECT, "audio", filename))
+        except OSError as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}")
+            return None
+
+    async def get(self, audio_hash: str, model_name: str) -> dict | None:
+        """
+        Возвращает результат транскрибации записи из кэша.
+
+        :param audio_hash: Хэш содержимого аудиофайла.
+        :param model_name: Имя модели Whisper.
+        :return: Результат транскрибации или None при промахе.
+        """
+        transcription_result = await self.cache_db.get_transcription(audio_hash, model_name, self.version)
+        if transcription_result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info(
+                f"[+] Транскрибация {audio_hash[:12]} ({model_name}) взята из кэша "
+                f"(попаданий: {self.hits}, промахов: {self.misses})"
+            )
+        return transcription_result
+
+    async def set(self, audio_hash: str, model_name: str, transcription_result: dict) -> None:
+        """
+        Сохраняет результат транскрибации записи в кэш.
+
+        :param audio_hash: Хэш содержимого аудиофайла.
+        :param model_name: Имя модели Whisper.
+        :param transcription_result: Результат транскрибации.
+        """
+        await self.cache_db.set_transcription(audio_hash, model_name, self.version, transcription_result)
@@ -0,0 +1,174 @@
+import time
+from abc import ABC, abstractmethod
+from importlib import metadata
+from typing import Any
+
+import numpy as np
+import torch
+
+from loggers import logger
+
+
+class TranscriptionEngine(ABC):
+    """
+    Базовый движок транскрибации: держит загруженную модель в памяти между транскрибациями.
+
+    Наследники реализуют load_model и run, а результат всегда приводится к формату
+    openai-whisper ({"text", "segments"}), поэтому запись в БД не зависит от выбранного движка.
+    """
+
+    name = ""
+    package = ""
+    compute_type = ""
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+        self.model: Any = None
+        self.load_time = 0.0
+
+    @classmethod
+    def get_version(cls) -> str:
+        """
+        Возвращает версию движка: пакет, его версию и точность вычислений.
+        Входит в ключ кэша транскрибаций.
+
+        :return: Строка вида "openai-whisper-20231117-fp32".
+        """
+        return f"{cls.package}-{metadata.version(cls.package)}-{cls.compute_type}"
+
+    @property
+    def is_loaded(self) -> bool:
+        """Возвращает True, если модель загружена в память."""
+        return self.model is not None
+
+    @abstractmethod
+    def load_model(self) -> Any:
+        """Загружает и возвращает модель."""
+
+    @abstractmethod
+    def run(self, audio: np.ndarray) -> dict:
+        """
+        Транскрибирует аудио загруженной моделью.
+
+        :param audio: Массив float32 с частотой 16 кГц.
+        :return: Результат транскрибации в формате openai-whisper.
+        """
+
+    def load(self) -> None:
+        """Загружает модель, если она ещё не загружена, и фиксирует время загрузки."""
+
+        if self.is_loaded:
+            return
+        start_time = time.perf_counter()
+        self.model = self.load_model()
+        self.load_time = time.perf_counter() - start_time
+        logger.info(f"[+] Модель {self.name} '{self.model_name}' загружена за {self.load_time:.2f} сек.")
+
+    def unload(self) -> None:
+        """Выгружает модель из памяти."""
+
+        if not self.is_loaded:
+            return
+        self.model = None
+        logger.info(f"[+] Модель {self.name} '{self.model_name}' выгружена")
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """
+        Транскрибирует аудио и логирует время инференса.
+
+        :param audio: Массив float32 с частотой 16 кГц.
+        :return: Результат транскрибации в формате openai-whisper.
+        """
+        self.load()
+        start_time = time.perf_counter()
+        result = self.run(audio)
+        inference_time = time.perf_counter() - start_time
+        logger.info(
+            f"[+] Инференс {self.name} '{self.model_name}' занял {inference_time:.2f} сек. "
+            f"(загрузка модели: {self.load_time:.2f} сек., выполнена один раз)"
+        )
+        return result
+
+
+class WhisperEngine(TranscriptionEngine):
+    """Эталонный openai-whisper на PyTorch, вычисления в fp32."""
+
+    name = "whisper"
+    package = "openai-whisper"
+    compute_type = "fp32"
+
+    def load_model(self) -> Any:
+        """Загружает модель openai-whisper."""
+
+        import whisper
+
+        return whisper.load_model(self.model_name)
+
+    def run(self, audio: np.ndarray) -> dict:
+        """
+        Транскрибирует аудио моделью openai-whisper в fp32.
+
+        :param audio: Массив float32 с частотой 16 кГц.
+        :return: Результат транскрибации openai-whisper.
+        """
+        return self.model.transcribe(audio, language="ru", fp16=False)
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """faster-whisper (CTranslate2) на CPU с квантованием весов в int8."""
+
+    name = "faster-whisper"
+    package = "faster-whisper"
+    compute_type = "int8"
+
+    def load_model(self) -> Any:
+        """Загружает модель faster-whisper с квантованием int8 и бюджетом потоков воркера."""
+
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(
+            self.model_name, device="cpu", compute_type=self.compute_type, cpu_threads=torch.get_num_threads()
+        )
+
+    def run(self, audio: np.ndarray) -> dict:
+        """
+        Транскрибирует аудио моделью faster-whisper и приводит сегменты к формату openai-whisper.
+
+        :param audio: Массив float32 с частотой 16 кГц.
+        :return: Результат транскрибации в формате openai-whisper.
+        """
+        segments, _ = self.model.transcribe(audio, language="ru")
+        result_segments = [
+            {
+                "id": segment.id,
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": segment.tokens,
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            }
+            for segment in segments
+        ]
+        return {"text": "".join(segment["text"] for segment in result_segments), "segments": result_segments}
+
+
+ENGINES: dict[str, type[TranscriptionEngine]] = {
+    WhisperEngine.name: WhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def get_engine_class(engine_name: str) -> type[TranscriptionEngine]:
+    """
+    Возвращает класс движка транскрибации по имени.
+
+    :param engine_name: Имя движка из ENGINES.
+    :return: Класс движка.
+    """
+    if engine_name not in ENGINES:
+        raise ValueError(f"Неизвестный движок транскрибации '{engine_name}', доступны: {', '.join(ENGINES)}")
+    return ENGINES[engine_name]
@@ -1,40 +1,125 @@
 import asyncio
 
+from config import (
+    FALLBACK_POLL_SECONDS,
+    TORCH_THREADS_PER_WORKER,
+    TRANSCRIBE_ENGINE,
+    TRANSCRIBE_LATENCY_TARGET_SECONDS,
+    TRANSCRIBE_LEASE_SECONDS,
+    TRANSCRIBE_WORKERS,
+    WHISPER_MODEL,
+    WHISPER_MODEL_TIERS,
+    WORKER_MAX_MODELS,
+)
 from db.db_call_data import CallData
 from db.db_analysis_data import AnalysisData
+from db.db_cache_data import CacheData
+from db.db_connector import BaseConnector
+from db.db_notify import CALL_INSERTED_CHANNEL, NotificationListener
+from transcribe_handler.cache import TranscriptionCache
+from transcribe_handler.engines import get_engine_class
+from transcribe_handler.scheduler import ModelScheduler
 from transcribe_handler.utils import get_transcription_whisper
+from transcribe_handler.worker_pool import TranscriptionPool
 from loggers import logger
 
 
+async def process_call(
+        call: dict,
+        pool: TranscriptionPool,
+        db_analysis: AnalysisData,
+        cache: TranscriptionCache,
+        model_name: str,
+) -> str | None:
+    """
+    Транскрибирует один звонок в пуле воркеров и сразу записывает результат в базу данных.
+    Если эта же запись уже транскрибировалась той же моделью, результат берётся из кэша без инференса.
+
+    :param call: Информация о звонке из БД.
+    :param pool: Запущенный пул воркеров транскрибации.
+    :param db_analysis: Экземпляр AnalysisData.
+    :param cache: Кэш транскрибаций.
+    :param model_name: Имя модели Whisper, выбранной для пачки звонков.
+    :return: id звонка, если транскрибация записана в БД, иначе None.
+    """
+    audio_hash = await cache.get_key(call["file_name"])
+    transcription_result = await cache.get(audio_hash, model_name) if audio_hash else None
+    if transcription_result is None:
+        transcription_result = await get_transcription_whisper(
+            filename=call["file_name"], pool=pool, model_name=model_name
+        )
+        if transcription_result is not None and audio_hash:
+            await cache.set(audio_hash, model_name, transcription_result)
+    if transcription_result is not None:
+        rec_result = await db_analysis.set_transcription(call["call_id"], transcription_result, model_name)
+        if rec_result:
+            return call["call_id"]
+    return None
+
+
 async def main() -> None:
     """
     Основная функция, выполняет обработку звонков для транскрипции с помощью библиотеки Whisper и записывает
-    результат в базу данных. Порядок работы:
-    - Получает имя аудиофайла.
-    - Вызывает функцию get_transcription_whisper для получения результата транскрипции.
-    - Если результат транскрипции получен, сохраняет его в базе данных.
-    - Если результат сохранен, изменяет статус транскрибации звонка в базе данных.
+    результат в базу данных. Модели Whisper загружаются один раз в воркерах пула и переиспользуются,
+    движок транскрибации (эталонный whisper в fp32 или faster-whisper в int8) задаётся TRANSCRIBE_ENGINE.
+    Порядок работы:
+    - Захватывает пачку звонков для транскрибации (несколько воркеров не получат один и тот же звонок).
+    - Повторно пришедшие записи берёт из кэша транскрибаций по хэшу содержимого.
+    - Для пачки выбирает одну модель Whisper по длительности звонков, размеру очереди и целевому времени.
+    - Параллельно отправляет аудиофайлы в пул воркеров через get_transcription_whisper.
+    - Как только результат транскрипции получен, сохраняет его в базе данных.
+    - Статусы транскрибации всех сохранённых звонков пачки обновляются одним запросом.
+    - Если звонков нет, ждёт уведомления о новом звонке (с резервным опросом раз в FALLBACK_POLL_SECONDS).
     """
     logger.info("[+] Start transcribe handler")
     db_call = CallData()
     db_analysis = AnalysisData()
     await db_analysis.create_tables()
-    while True:
-        try:
-            calls_for_transcription = await db_call.get_calls_for_transcription()
-            if not calls_for_transcription:
-                logger.info("[PAUSE] calls_for_transcription is empty, transcribe_handler sleep 5min")
-                await asyncio.sleep(300)
-                continue
-            for call in calls_for_transcription:
-                filename = call["file_name"]
-                transcription_result = await get_transcription_whisper(filename=filename)
-                if transcription_result is not None:
-                    rec_result = await db_analysis.set_transcription(call["call_id"], transcription_result)
-                    if rec_result:
-                        await db_call.update_status(call["call_id"], "TRANSCRIBE_STATUS", "[+]")
-        except Exception as ex:
-            logger.debug(f"{ex.__class__.__name__}: {ex}")
+    cache = TranscriptionCache(CacheData(), get_engine_class(TRANSCRIBE_ENGINE).get_version())
+    worker_id = db_call.get_worker_id()
+    listener = NotificationListener(CALL_INSERTED_CHANNEL)
+    await listener.start()
+    pool = TranscriptionPool(
+        TRANSCRIBE_ENGINE,
+        WHISPER_MODEL,
+        workers=TRANSCRIBE_WORKERS,
+        torch_threads=TORCH_THREADS_PER_WORKER,
+        max_models=WORKER_MAX_MODELS,
+    )
+    pool.start()
+    scheduler = ModelScheduler(WHISPER_MODEL_TIERS, TRANSCRIBE_LATENCY_TARGET_SECONDS, workers=pool.size)
+    try:
+        while True:
+            try:
+                calls_for_transcription = await db_call.claim_calls(
+                    "TRANSCRIBE", worker_id, count=max(pool.size, 5), lease_seconds=TRANSCRIBE_LEASE_SECONDS
+                )
+                if not calls_for_transcription:
+                    logger.info("[PAUSE] calls_for_transcription is empty, transcribe_handler waits for new calls")
+                    await listener.wait(FALLBACK_POLL_SECONDS)
+                    continue
+                queue_seconds = await db_call.get_queue_seconds("TRANSCRIBE")
+                model_name = scheduler.choose([call["duration"] for call in calls_for_transcription], queue_seconds)
+                processed_ids = await asyncio.gather(
+                    *(
+                        process_call(call, pool, db_analysis, cache, model_name)
+                        for call in calls_for_transcription
+                    ),
+                    return_exceptions=True,
+                )
+                for call, call_id in zip(calls_for_transcription, processed_ids):
+                    if isinstance(call_id, BaseException):
+                        logger.debug(f"Звонок {call['call_id']}: {call_id.__class__.__name__}: {call_id}")
+                await db_call.update_status_batch(
+                    [call_id for call_id in processed_ids if isinstance(call_id, str)], "TRANSCRIBE_STATUS", "[+]"
+                )
+            except Exception as ex:
+                logger.debug(f"{ex.__class__.__name__}: {ex}")
+    finally:
+        pool.shutdown()
+        await db_call.release_calls("TRANSCRIBE", worker_id)
+        await listener.close()
+        await BaseConnector.close_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import glob
+import os
+import subprocess
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import webrtcvad
+
+from config import MIN_SILENCE_SECONDS, PATH_PROJECT, SPEECH_PAD_SECONDS, VAD_AGGRESSIVENESS
+from loggers import logger
+
+SAMPLE_RATE = 16000
+VAD_FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000
+PCM_CACHE_PATH = os.path.join(PATH_PROJECT, "audio", "pcm")
+
+
+def get_pcm_path(input_file: str, channel: int | None = None) -> str:
+    """
+    Возвращает путь к кэшу PCM для аудиофайла.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :param channel: Номер канала записи или None для моно-сведения всех каналов.
+    :return: Путь к файлу .npy с декодированным звуком.
+    """
+    suffix = f".ch{channel}" if channel is not None else ""
+    return os.path.join(PCM_CACHE_PATH, f"{os.path.basename(input_file)}{suffix}.npy")
+
+
+def get_channel_count(input_file: str) -> int:
+    """
+    Определяет количество каналов аудиофайла через ffprobe.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :return: Количество каналов первой аудиодорожки.
+    """
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=channels", "-of", "csv=p=0", input_file,
+    ]
+    output = subprocess.run(command, capture_output=True, check=True, text=True).stdout
+    return int(output.strip() or 1)
+
+
+def decode_audio(input_file: str, channel: int | None = None) -> str:
+    """
+    Один раз декодирует аудиофайл через ffmpeg в 16 кГц моно PCM (int16) и сохраняет результат в кэш.
+    Повторные вызовы для того же файла используют готовый кэш.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :param channel: Номер канала записи или None для моно-сведения всех каналов.
+    :return: Путь к файлу .npy с декодированным звуком.
+    """
+    pcm_path = get_pcm_path(input_file, channel)
+    if os.path.isfile(pcm_path) and os.path.getmtime(pcm_path) >= os.path.getmtime(input_file):
+        return pcm_path
+    os.makedirs(PCM_CACHE_PATH, exist_ok=True)
+    channel_filter = ["-af", f"pan=mono|c0=c{channel}"] if channel is not None else ["-ac", "1"]
+    command = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", input_file, *channel_filter,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    output = subprocess.run(command, capture_output=True, check=True).stdout
+    tmp_path = f"{pcm_path[:-len('.npy')]}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, np.frombuffer(output, np.int16))
+    os.replace(tmp_path, pcm_path)
+    return pcm_path
+
+
+def load_pcm(pcm_path: str) -> np.ndarray:
+    """
+    Загружает декодированный звук из кэша без копирования в память.
+
+    :param pcm_path: Путь к файлу .npy.
+    :return: Массив отсчётов int16.
+    """
+    return np.load(pcm_path, mmap_mode="r")
+
+
+def clear_pcm_cache(input_file: str) -> None:
+    """
+    Удаляет кэш PCM аудиофайла после завершения его обработки.
+
+    :param input_file: Полный путь к аудиофайлу.
+    """
+    for pcm_path in glob.glob(f"{glob.escape(get_pcm_path(input_file)[:-len('.npy')])}*.npy"):
+        try:
+            os.remove(pcm_path)
+        except OSError as ex:
+            logger.debug(f"{ex.__class__.__name__}: {ex}")
+
+
+def detect_speech(audio: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Находит участки речи детектором голосовой активности WebRTC (работает на CPU).
+
+    Паузы короче MIN_SILENCE_SECONDS считаются частью речи, каждый участок расширяется на
+    SPEECH_PAD_SECONDS с обеих сторон, чтобы не обрезать начало и конец фраз.
+
+    :param audio: Массив отсчётов int16 с частотой 16 кГц.
+    :return: Список участков речи (начало, конец) в отсчётах исходной записи.
+    """
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    min_silence = int(MIN_SILENCE_SECONDS * SAMPLE_RATE)
+    pad = int(SPEECH_PAD_SECONDS * SAMPLE_RATE)
+    spans: list[tuple[int, int]] = []
+    for start in range(0, len(audio) - VAD_FRAME_SAMPLES + 1, VAD_FRAME_SAMPLES):
+        frame = np.ascontiguousarray(audio[start:start + VAD_FRAME_SAMPLES]).tobytes()
+        if not vad.is_speech(frame, SAMPLE_RATE):
+            continue
+        end = start + VAD_FRAME_SAMPLES
+        if spans and start - spans[-1][1] < min_silence:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    padded_spans: list[tuple[int, int]] = []
+    for start, end in spans:
+        start, end = max(start - pad, 0), min(end + pad, len(audio))
+        if padded_spans and start <= padded_spans[-1][1]:
+            padded_spans[-1] = (padded_spans[-1][0], end)
+        else:
+            padded_spans.append((start, end))
+    return padded_spans
+
+
+def split_chunks(spans: list[tuple[int, int]], chunk_samples: int) -> list[list[tuple[int, int]]]:
+    """
+    Делит участки речи на чанки примерно по chunk_samples отсчётов речи для параллельной транскрибации.
+
+    Чанки режутся по паузам между участками речи. Участок непрерывной речи длиннее чанка
+    (без пауз длиннее MIN_SILENCE_SECONDS) режется на части по chunk_samples.
+
+    :param spans: Участки речи (начало, конец) в отсчётах исходной записи.
+    :param chunk_samples: Целевая длина речи в чанке в отсчётах.
+    :return: Список чанков, каждый - список участков речи.
+    """
+    chunks: list[list[tuple[int, int]]] = []
+    chunk: list[tuple[int, int]] = []
+    chunk_length = 0
+    for span_start, span_end in spans:
+        for start in range(span_start, span_end, chunk_samples):
+            end = min(start + chunk_samples, span_end)
+            if chunk and chunk_length + end - start > chunk_samples:
+                chunks.append(chunk)
+                chunk, chunk_length = [], 0
+            chunk.append((start, end))
+            chunk_length += end - start
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def cut_speech(audio: np.ndarray, spans: list[tuple[int, int]]) -> tuple[np.ndarray, list[tuple[float, float]]]:
+    """
+    Склеивает участки речи в один массив для Whisper и строит карту времени.
+
+    :param audio: Массив отсчётов int16 с частотой 16 кГц.
+    :param spans: Участки речи (начало, конец) в отсчётах исходной записи.
+    :return: Кортеж из массива float32 для Whisper и карты времени - списка пар
+    (начало участка в склеенной записи, начало участка в исходной записи) в секундах.
+    """
+    timeline = []
+    trimmed_start = 0
+    for start, end in spans:
+        timeline.append((trimmed_start / SAMPLE_RATE, start / SAMPLE_RATE))
+        trimmed_start += end - start
+    if not spans:
+        return np.zeros(0, np.float32), timeline
+    speech_audio = np.concatenate([audio[start:end] for start, end in spans])
+    return speech_audio.astype(np.float32) / 32768.0, timeline
+
+
+def restore_time(seconds: float, timeline: list[tuple[float, float]], is_end: bool = False) -> float:
+    """
+    Переводит время в склеенной записи во время исходной записи.
+
+    :param seconds: Время в склеенной записи.
+    :param timeline: Карта времени из cut_speech.
+    :param is_end: True для конца сегмента: время на стыке участков относится к предыдущему участку.
+    :return: Время в исходной записи.
+    """
+    trimmed_starts = [trimmed_start for trimmed_start, _ in timeline]
+    index = (bisect_left(trimmed_starts, seconds) if is_end else bisect_right(trimmed_starts, seconds)) - 1
+    trimmed_start, original_start = timeline[max(index, 0)]
+    return round(original_start + seconds - trimmed_start, 3)
+
+
+def restore_timestamps(transcription_result: dict, timeline: list[tuple[float, float]]) -> dict:
+    """
+    Возвращает сегментам транскрибации время исходной записи.
+
+    :param transcription_result: Результат транскрибации склеенной записи.
+    :param timeline: Карта времени из cut_speech.
+    :return: Тот же результат с исправленными start и end у сегментов.
+    """
+    if not timeline:
+        return transcription_result
+    for segment in transcription_result["segments"]:
+        segment["start"] = restore_time(segment["start"], timeline)
+        segment["end"] = restore_time(segment["end"], timeline, is_end=True)
+    return transcription_result
@@ -0,0 +1,55 @@
+from loggers import logger
+
+
+class ModelScheduler:
+    """
+    Выбирает модель Whisper для пачки звонков по длительности самого длинного звонка, размеру очереди
+    и целевому времени транскрибации.
+
+    Ожидаемое время транскрибации оценивается как время разбора очереди пулом воркеров
+    плюс время транскрибации звонка, умноженные на коэффициент реального времени модели.
+    Выбирается самая точная модель, укладывающаяся в целевое время, а если не укладывается ни одна -
+    самая быстрая. Модель выбирается одна на всю пачку, чтобы звонки разной длительности не заставляли
+    воркеры выгружать и заново загружать модели сверх WORKER_MAX_MODELS.
+    """
+
+    def __init__(self, tiers: dict[str, float], latency_target: float, workers: int) -> None:
+        if not tiers:
+            raise ValueError("Не передано ни одной модели Whisper для выбора")
+        self.tiers = tiers
+        self.latency_target = latency_target
+        self.workers = max(workers, 1)
+
+    def estimate_latency(self, model_name: str, duration: int, queue_seconds: int) -> float:
+        """
+        Оценивает время транскрибации звонка моделью с учётом очереди.
+
+        :param model_name: Имя модели Whisper.
+        :param duration: Длительность звонка в секундах.
+        :param queue_seconds: Суммарная длительность звонков в очереди в секундах.
+        :return: Ожидаемое время в секундах.
+        """
+        return (queue_seconds / self.workers + duration) * self.tiers[model_name]
+
+    def choose(self, durations: list[int | None], queue_seconds: int) -> str:
+        """
+        Выбирает модель Whisper для пачки звонков.
+
+        :param durations: Длительности звонков пачки в секундах (None, если неизвестна).
+        :param queue_seconds: Суммарная длительность звонков в очереди в секундах.
+        :return: Имя выбранной модели.
+        """
+        duration = max((duration or 0 for duration in durations), default=0)
+        model_name = next(
+            (
+                name for name in self.tiers
+                if self.estimate_latency(name, duration, queue_seconds) <= self.latency_target
+            ),
+            list(self.tiers)[-1],
+        )
+        logger.info(
+            f"[+] Для пачки из {len(durations)} звонков (самый длинный - {duration} сек.) выбрана модель "
+            f"'{model_name}' (очередь: {queue_seconds} сек.; ожидаемое время "
+            f"{self.estimate_latency(model_name, duration, queue_seconds):.0f} из {self.latency_target} сек.)"
+        )
+        return model_name
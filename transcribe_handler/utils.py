@@ -1,30 +1,144 @@
+import asyncio
 import os
 
-import whisper
-
-from config import PATH_PROJECT
+from config import CHANNEL_SPEAKERS, CHUNK_SECONDS, LONG_CALL_SECONDS, PATH_PROJECT, SPLIT_STEREO_CHANNELS
 from loggers import logger
+from transcribe_handler.preprocessing import (
+    SAMPLE_RATE,
+    clear_pcm_cache,
+    cut_speech,
+    decode_audio,
+    detect_speech,
+    get_channel_count,
+    load_pcm,
+    restore_timestamps,
+    split_chunks,
+)
+from transcribe_handler.worker_pool import TranscriptionPool, get_worker_engine
+
+
+def find_speech(input_file: str, channel: int | None = None) -> list[tuple[int, int]]:
+    """
+    Декодирует аудиофайл в 16 кГц моно PCM и находит в нём участки речи. Выполняется внутри пула транскрибации.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :param channel: Номер канала записи или None для моно-сведения всех каналов.
+    :return: Участки речи (начало, конец) в отсчётах исходной записи.
+    """
+    audio = load_pcm(decode_audio(input_file, channel))
+    spans = detect_speech(audio)
+    logger.info(
+        f"[+] Для транскрибации оставлено {sum(end - start for start, end in spans) / SAMPLE_RATE:.1f} "
+        f"из {len(audio) / SAMPLE_RATE:.1f} сек. записи {os.path.basename(input_file)}"
+    )
+    return spans
+
+
+def transcribe_spans(input_file: str, channel: int | None, spans: list[tuple[int, int]], model_name: str) -> dict:
+    """
+    Транскрибирует участки речи аудиофайла моделью текущего воркера. Выполняется внутри пула транскрибации.
+
+    Участки склеиваются без пауз (гудки, музыка ожидания, тишина вырезаются),
+    а время сегментов возвращается к исходной записи.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :param channel: Номер канала записи или None для моно-сведения всех каналов.
+    :param spans: Участки речи (начало, конец) в отсчётах исходной записи.
+    :param model_name: Имя модели Whisper.
+    :return: Результат транскрибации Whisper.
+    """
+    speech_audio, timeline = cut_speech(load_pcm(decode_audio(input_file, channel)), spans)
+    if not len(speech_audio):
+        return {"text": "", "segments": []}
+    return restore_timestamps(get_worker_engine(model_name).transcribe(speech_audio), timeline)
+
+
+def stitch_chunks(chunk_results: list[dict]) -> dict:
+    """
+    Склеивает результаты транскрибации чанков одной записи в порядке следования чанков.
+
+    :param chunk_results: Результаты транскрибации чанков (время сегментов уже в шкале исходной записи).
+    :return: Результат транскрибации в формате Whisper (text, segments).
+    """
+    segments = [segment for chunk_result in chunk_results for segment in chunk_result["segments"]]
+    for segment_id, segment in enumerate(segments):
+        segment["id"] = segment_id
+    text = " ".join(chunk_result["text"].strip() for chunk_result in chunk_results if chunk_result["text"].strip())
+    return {"text": text, "segments": segments}
+
+
+async def transcribe_channel(input_file: str, channel: int | None, pool: TranscriptionPool, model_name: str) -> dict:
+    """
+    Транскрибирует канал записи в пуле воркеров.
+    Если речи в записи больше LONG_CALL_SECONDS, она делится по паузам на чанки примерно по CHUNK_SECONDS,
+    чанки транскрибируются параллельно на разных воркерах и склеиваются обратно.
+
+    :param input_file: Полный путь к аудиофайлу.
+    :param channel: Номер канала записи или None для моно-сведения всех каналов.
+    :param pool: Запущенный пул воркеров транскрибации.
+    :param model_name: Имя модели Whisper.
+    :return: Результат транскрибации Whisper.
+    """
+    spans = await pool.run(find_speech, input_file, channel)
+    if sum(end - start for start, end in spans) > LONG_CALL_SECONDS * SAMPLE_RATE:
+        chunks = split_chunks(spans, int(CHUNK_SECONDS * SAMPLE_RATE))
+        logger.info(f"[+] Длинная запись {os.path.basename(input_file)} разделена на {len(chunks)} чанков")
+    else:
+        chunks = [spans]
+    chunk_results = await asyncio.gather(
+        *(pool.run(transcribe_spans, input_file, channel, chunk, model_name) for chunk in chunks)
+    )
+    return stitch_chunks(list(chunk_results))
+
+
+def merge_channels(channel_results: list[dict]) -> dict:
+    """
+    Объединяет результаты транскрибации каналов в один диалог: сегменты сортируются по времени,
+    каждому сегменту проставляется говорящий из CHANNEL_SPEAKERS, а текст собирается по репликам.
+
+    :param channel_results: Результаты транскрибации каналов в порядке номеров каналов.
+    :return: Результат транскрибации в формате Whisper (text, segments).
+    """
+    segments = []
+    for channel, channel_result in enumerate(channel_results):
+        for segment in channel_result["segments"]:
+            segments.append({**segment, "channel": channel, "speaker": CHANNEL_SPEAKERS.get(channel, str(channel))})
+    segments.sort(key=lambda segment: (segment["start"], segment["channel"]))
+    for segment_id, segment in enumerate(segments):
+        segment["id"] = segment_id
+    text = "\n".join(f"{segment['speaker']}: {segment['text'].strip()}" for segment in segments)
+    return {"text": text, "segments": segments}
 
 
-async def get_transcription_whisper(filename: str) -> dict | None:
+async def get_transcription_whisper(filename: str, pool: TranscriptionPool, model_name: str) -> dict | None:
     """
     Функция принимает имя аудиофайла в качестве параметра и возвращает результат транскрипции
-    файла с помощью библиотеки Whisper.
+    файла с помощью библиотеки Whisper. Каналы стерео-записи (менеджер и клиент) транскрибируются
+    параллельно на разных воркерах и объединяются в диалог с метками говорящих.
+    Длинные записи дополнительно делятся на чанки, которые транскрибируются параллельно.
 
     :param filename: Имя аудио файла.
+    :param pool: Запущенный пул воркеров транскрибации.
+    :param model_name: Имя модели Whisper, выбранной для звонка.
     :return: Полученный из аудио файла словарь с текстом и расшифровкой каналов
     """
     transcription_result = None
-    model = "large"
     try:
         if not isinstance(filename, str):
             raise TypeError("Передан неверный filename, ожидается тип данных str")
         input_file = os.path.join(PATH_PROJECT, "audio", filename)
         if not os.path.isfile(input_file):
             raise FileNotFoundError("Аудиофайл не найден, проверьте передаваемый путь")
-        setting_model = whisper.load_model(model)
         logger.info(f"[+] Началась обработка звонка {filename}")
-        transcription_result = setting_model.transcribe(input_file, language="ru", fp16=False)
+        channels = await pool.run(get_channel_count, input_file) if SPLIT_STEREO_CHANNELS else 1
+        if channels == 2:
+            channel_results = await asyncio.gather(
+                *(transcribe_channel(input_file, channel, pool, model_name) for channel in range(channels))
+            )
+            transcription_result = merge_channels(list(channel_results))
+        else:
+            transcription_result = await transcribe_channel(input_file, None, pool, model_name)
+        clear_pcm_cache(input_file)
     except TypeError as type_ex:
         logger.error(f"{type_ex.__class__.__name__}: {type_ex}")
     except FileNotFoundError as file_ex:
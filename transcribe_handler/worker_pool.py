@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+import torch
+
+from loggers import logger
+from transcribe_handler.engines import TranscriptionEngine, get_engine_class
+
+_worker_models: OrderedDict[str, TranscriptionEngine] = OrderedDict()
+_worker_engine_class: type[TranscriptionEngine] | None = None
+_worker_default_model: str | None = None
+_worker_max_models = 1
+
+
+def init_worker(engine_name: str, model_name: str, torch_threads: int, max_models: int = 1) -> None:
+    """
+    Инициализирует процесс-воркер: ограничивает число потоков torch и загружает модель по умолчанию.
+
+    :param engine_name: Имя движка транскрибации.
+    :param model_name: Имя модели Whisper по умолчанию.
+    :param torch_threads: Количество потоков torch, выделяемых воркеру.
+    :param max_models: Количество моделей, одновременно хранимых в памяти воркера.
+    """
+    global _worker_engine_class, _worker_default_model, _worker_max_models
+    torch.set_num_threads(torch_threads)
+    _worker_engine_class = get_engine_class(engine_name)
+    _worker_default_model = model_name
+    _worker_max_models = max(max_models, 1)
+    get_worker_engine(model_name)
+
+
+def get_worker_engine(model_name: str | None = None) -> TranscriptionEngine:
+    """
+    Возвращает движок с моделью, загруженной в текущем воркере. Если модели нет в памяти, загружает её,
+    предварительно выгрузив давно не использовавшиеся модели сверх лимита воркера.
+
+    :param model_name: Имя модели Whisper (по умолчанию - модель, заданная при инициализации воркера).
+    :return: Движок транскрибации текущего процесса.
+    """
+    if _worker_engine_class is None or _worker_default_model is None:
+        raise RuntimeError("Движок транскрибации не инициализирован в воркере")
+    model_name = model_name or _worker_default_model
+    if model_name in _worker_models:
+        _worker_models.move_to_end(model_name)
+        return _worker_models[model_name]
+    while len(_worker_models) >= _worker_max_models:
+        _, evicted_model = _worker_models.popitem(last=False)
+        evicted_model.unload()
+    model = _worker_engine_class(model_name)
+    model.load()
+    _worker_models[model_name] = model
+    return model
+
+
+class TranscriptionPool:
+    """
+    Пул воркеров для транскрибации.
+
+    При workers > 0 запускается пул из N процессов, каждый со своими моделями и своим бюджетом потоков torch.
+    Каждый воркер хранит в памяти до max_models моделей и выгружает давно не использовавшиеся.
+    При workers == 0 модель загружается в текущем процессе, а транскрибация выполняется в отдельном потоке,
+    чтобы не блокировать цикл asyncio.
+    """
+
+    def __init__(
+            self,
+            engine_name: str,
+            model_name: str,
+            workers: int,
+            torch_threads: int,
+            max_models: int = 1,
+    ) -> None:
+        self.engine_name = engine_name
+        self.model_name = model_name
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.max_models = max_models
+        self.executor: Executor | None = None
+
+    @property
+    def size(self) -> int:
+        """Количество задач, которые пул выполняет одновременно."""
+        return max(self.workers, 1)
+
+    def start(self) -> None:
+        """Запускает пул воркеров."""
+
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(self.engine_name, self.model_name, self.torch_threads, self.max_models),
+            )
+            logger.info(
+                f"[+] Запущен пул транскрибации {self.engine_name}: "
+                f"{self.workers} процессов по {self.torch_threads} потоков torch"
+            )
+        else:
+            init_worker(self.engine_name, self.model_name, self.torch_threads, self.max_models)
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            logger.info("[+] Транскрибация выполняется в текущем процессе")
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет функцию в пуле воркеров, не блокируя цикл asyncio.
+
+        :param func: Функция верхнего уровня модуля (должна сериализоваться pickle).
+        :param args: Аргументы функции.
+        :return: Результат выполнения функции.
+        """
+        if self.executor is None:
+            raise RuntimeError("Пул транскрибации не запущен")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def shutdown(self) -> None:
+        """Останавливает пул воркеров."""
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None